@@ -0,0 +1,66 @@
+"""
+Memory taken by the collected cards, as CollectedCard objects in lists and in the columnar UserCollection store.
+
+    python benchmarks/collections_memory.py
+"""
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from common import prepare_environment, measure_memory
+
+prepare_environment()
+
+from modules.card_game import Card, CardCatalog, Collection, CollectedCard, Rarity, SCQuestion, \
+    UserCollection  # noqa: E402
+
+SIZES = (100_000, 1_000_000)
+USERS = 1000
+CARDS = 500
+
+
+def make_cards() -> list[Card]:
+    collections = [Collection(f'Collection {i}', ':snowflake:', 1., i) for i in range(10)]
+    return [Card(f'Card {i}', random.choice(list(Rarity)), collections[i % 10], Path('card_images', f'{i}.png'),
+                 SCQuestion('Question?', 'Answer'), None, 1.) for i in range(CARDS)]
+
+
+def make_entries(cards: list[Card], size: int) -> list[tuple[int, Card, datetime, str | float]]:
+    start = datetime(2024, 1, 1)
+    return [(random.randrange(USERS), random.choice(cards), start + timedelta(seconds=i),
+             'UNGRADED' if random.random() < 0.7 else round(random.uniform(6, 10), 1)) for i in range(size)]
+
+
+def build_objects(entries) -> dict:
+    dct = {}
+    for user_id, card, date, grade in entries:
+        dct.setdefault(user_id, []).append(CollectedCard(card, date, grade))
+    return dct
+
+
+def build_columnar(entries, catalog: CardCatalog) -> dict:
+    dct = {}
+    for user_id, card, date, grade in entries:
+        if user_id not in dct:
+            dct[user_id] = UserCollection(catalog)
+        dct[user_id].add(card, date, grade)
+    return dct
+
+
+def main():
+    random.seed(0)
+    cards = make_cards()
+    catalog = CardCatalog(cards)
+    print(f'{"collected cards":>16} {"objects":>12} {"columnar":>12} {"ratio":>7}')
+    for size in SIZES:
+        entries = make_entries(cards, size)
+        # the entries share their datetime objects with the object graph, copy them so both pay for the dates
+        objects, _ = measure_memory(lambda: build_objects([(u, c, d.replace(), g) for u, c, d, g in entries]))
+        columnar, _ = measure_memory(lambda: build_columnar(entries, catalog))
+        print(f'{size:>16,} {objects / 2 ** 20:>10.1f}MB {columnar / 2 ** 20:>10.1f}MB {objects / columnar:>6.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Helpers shared by the benchmarks. The bot modules read config.yml and data/ relative to the working directory at
+import time, so the benchmarks run inside a scratch copy of the configuration with empty data files.
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+ROOT = Path(__file__).resolve().parent.parent
+EMPTY_DATA = {'cards.json': [], 'collections.json': {}, 'collections_list.json': [], 'map_lists.json': [],
+              'matches.json': [], 'picks.json': [], 'profiles.json': {}, 'queue.json': '[]',
+              'config.json': {'token': 'TOKEN', 'week': 0, 'playoffs': True, 'message_count': 0,
+                              'current_collection_id': 0}}
+
+
+def prepare_environment(path: Path | None = None) -> Path:
+    """
+    Sets up a bot directory, a scratch one unless the path is given, makes it the working directory and puts the
+    repository on the import path. Files already in the directory are kept.
+    """
+    if path is None:
+        path = Path(tempfile.mkdtemp(prefix='icedoutbot-bench-'))
+    for directory in ('data', 'logs', 'card_images'):
+        (path / directory).mkdir(parents=True, exist_ok=True)
+    if not (path / 'config.yml').exists():
+        shutil.copy(ROOT / 'config.yml', path / 'config.yml')
+    for name, content in EMPTY_DATA.items():
+        if not (path / 'data' / name).exists():
+            with open(path / 'data' / name, 'w') as file:
+                json.dump(content, file)
+    os.chdir(path)
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    return path
+
+
+def measure_memory(build: Callable[[], object]) -> tuple[int, object]:
+    """
+    Returns the number of bytes allocated by build() that are still alive when it returns, together with its result.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+
+def measure_time(func: Callable[[], object], repeat: int = 5, number: int = 1) -> float:
+    """
+    Returns the best time in seconds of one call to func() over several repeats.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
@@ -0,0 +1,173 @@
+"""
+Generates a consistent set of data files at any scale: cards, collections, collected cards, 3P League matches, picks
+and map lists over several weeks, queues and profiles, and placeholder images for every card and the grade overlay.
+The files are written by the bot's own managers, so they are in the exact format the bot reads.
+
+    python benchmarks/generate_data.py --output /tmp/icedout --users 100000 --cards 5000 --weeks 8
+    cd /tmp/icedout && python /path/to/IcedOutBot/start.py
+"""
+from __future__ import annotations
+
+import argparse
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from common import prepare_environment
+
+CARD_WORDS = ('Bollard', 'Pole', 'Plate', 'Sign', 'Meta', 'Chevron', 'Roadline', 'Car', 'Antenna', 'Flag')
+IMAGE_SIZE = (200, 280)
+
+
+def generate(users: int, cards: int, collections: int = 10, cards_per_user: int = 10, weeks: int = 1,
+             league_players: int = 0, pick_rate: float = 0.6, queues: int = 0, queue_length: int = 0,
+             profile_rate: float = 0.3, seed: int = 0) -> dict[str, int]:
+    """
+    Fills the bot's managers with synthetic data and saves it to data/ in the working directory. User ids are
+    1 to users, league players are the first users.
+
+    :return: the number of generated items of every kind
+    """
+    from modules.card_game import Card, Collection, Rarity, SCQuestion, MCQuestion, UserCollection, UNGRADED
+    from modules.data import Tier
+    from modules.functions import save_week
+    from modules.initializer import card_game_manager, manager, queue_manager, profile_manager
+    from modules.queue import Queue
+
+    rng = random.Random(seed)
+    # the weekly country maps are drawn with the random module
+    random.seed(seed)
+
+    card_game_manager.collections_list = [Collection(f'Collection {i + 1}', ':snowflake:', 1., i)
+                                          for i in range(collections)]
+    card_game_manager.cards_list = [
+        Card(f'Card {i + 1} {rng.choice(CARD_WORDS)}', rng.choices(list(Rarity), weights=(60, 30, 10))[0],
+             card_game_manager.collections_list[i % collections], Path('card_images', f'card_{i + 1}.png'),
+             SCQuestion(f'Question {i + 1}?', f'Answer {i + 1}') if i % 2 else
+             MCQuestion(f'Question {i + 1}?', f'Answer {i + 1};Wrong {i + 1};Other {i + 1}'), None, 1.)
+        for i in range(cards)]
+    card_game_manager.save_collections_list()
+    card_game_manager.save_cards()
+    card_game_manager.load()
+    start = datetime.now() - timedelta(days=365)
+    collected = 0
+    for user_id in range(1, users + 1):
+        count = rng.randint(0, 2 * cards_per_user)
+        if count == 0:
+            continue
+        collection = card_game_manager.collections[user_id] = UserCollection(card_game_manager.catalog)
+        for date in sorted(start + timedelta(seconds=rng.randrange(365 * 86400)) for _ in range(count)):
+            grade = UNGRADED if rng.random() < 0.7 else round(rng.uniform(6, 10), 1)
+            collection.add(rng.choice(card_game_manager.cards_list), date, grade)
+        collected += count
+    card_game_manager.save_collections()
+
+    matches, picks = generate_league(manager, min(league_players, users), weeks, pick_rate, list(Tier), rng)
+    save_week(weeks)
+
+    queue_manager.queues = []
+    for i in range(queues):
+        queue = Queue(f'Queue {i + 1}')
+        queue.ids = rng.sample(range(1, users + 1), min(queue_length, users))
+        queue.pos = rng.randint(0, len(queue.ids))
+        queue_manager.queues.append(queue)
+    queue_manager.save_queues()
+
+    profile_manager.profile_dict = {user_id: ''.join(rng.choices('0123456789abcdef', k=24))
+                                    for user_id in range(1, users + 1) if rng.random() < profile_rate}
+    profile_manager.save_profiles()
+    return {'users': users, 'cards': cards, 'collections': collections, 'collected cards': collected,
+            'weeks': weeks, 'matches': matches, 'picks': picks, 'queues': queues,
+            'profiles': len(profile_manager.profile_dict)}
+
+
+def generate_league(manager, players: int, weeks: int, pick_rate: float, tiers: list, rng: random.Random) \
+        -> tuple[int, int]:
+    """
+    Pairs the players within their tiers every week and lets them pick from that week's map lists. Matches are
+    announced when both players picked.
+    """
+    import modules.data as data
+    from modules.classes import ArbitraryPick, Match3PLeague, Pick
+    from modules.functions import save_json
+
+    # map lists of earlier runs would be kept for their weeks
+    save_json(Path('data', 'map_lists.json'), [])
+    manager.matches = []
+    manager.picks = []
+    tier_size = max(2, -(-players // len(tiers)))
+    for week in range(1, weeks + 1):
+        manager.set_current_week(week)
+        ids = list(range(1, players + 1))
+        rng.shuffle(ids)
+        for idx in range(0, len(ids) - 1, 2):
+            match = Match3PLeague(ids[idx], ids[idx + 1], tiers[min(idx // tier_size, len(tiers) - 1)], week)
+            manager.matches.append(match)
+            picked = 0
+            for user_id in (match.id_1, match.id_2):
+                if rng.random() >= pick_rate:
+                    continue
+                pick = ArbitraryPick(rng.sample(manager.world_map_list, data.WORLD_MAP_PICKS_COUNT),
+                                     rng.sample(manager.world_map_list, data.WORLD_MAP_VETOES_COUNT),
+                                     rng.sample(manager.country_map_list, data.COUNTRY_MAP_PICKS_COUNT),
+                                     rng.sample(manager.country_map_list, data.COUNTRY_MAP_VETOES_COUNT),
+                                     rng.choice(list(data.Gamemode)) if data.MODE_REDEMPTION else None, [])
+                manager.picks.append(Pick(user_id, match, pick))
+                picked += 1
+            match.announced = picked == 2
+    manager.save_matches()
+    return len(manager.matches), len(manager.picks)
+
+
+def create_images(cards: list, size: tuple[int, int] = IMAGE_SIZE):
+    from PIL import Image, ImageDraw
+    for card in cards:
+        image = Image.new('RGB', size, color=tuple(random.Random(card.name).randrange(40, 200) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        draw.rectangle((4, 4, size[0] - 5, size[1] - 5), outline=(255, 255, 255), width=2)
+        draw.text((12, 12), f'{card.name}\n{card.rarity.name}\n{card.collection.name}', fill=(255, 255, 255))
+        image.save(card.image_path)
+
+
+def create_grade_overlay(size: tuple[int, int] = IMAGE_SIZE):
+    """
+    The frame pasted over graded cards. The bot draws the grade at the coordinates of the real card images, which are
+    larger than the placeholders, so it isn't visible on them.
+    """
+    from PIL import Image, ImageDraw
+    overlay = Image.new('RGBA', size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    draw.rectangle((0, size[1] - size[1] // 8, size[0] - 1, size[1] - 1), fill=(255, 215, 0, 255))
+    overlay.save(Path('data', 'grade.png'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic bot data.')
+    parser.add_argument('--output', type=Path, required=True,
+                        help='bot directory to write data/ and card_images/ into, created if missing')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--cards', type=int, default=500)
+    parser.add_argument('--collections', type=int, default=10)
+    parser.add_argument('--cards-per-user', type=int, default=10, help='average number of collected cards')
+    parser.add_argument('--weeks', type=int, default=4, help='weeks of 3P League matches and map lists')
+    parser.add_argument('--league-players', type=int, default=100)
+    parser.add_argument('--pick-rate', type=float, default=0.6, help='share of players that sent their picks')
+    parser.add_argument('--queues', type=int, default=2)
+    parser.add_argument('--queue-length', type=int, default=50)
+    parser.add_argument('--profile-rate', type=float, default=0.3, help='share of users with a profile')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-images', action='store_true',
+                        help='skip the placeholder card images and the grade overlay')
+    args = parser.parse_args()
+    prepare_environment(args.output.resolve())
+    counts = generate(args.users, args.cards, args.collections, args.cards_per_user, args.weeks, args.league_players,
+                      args.pick_rate, args.queues, args.queue_length, args.profile_rate, args.seed)
+    if not args.no_images:
+        from modules.initializer import card_game_manager
+        create_images(card_game_manager.cards_list)
+        create_grade_overlay()
+    print(', '.join(f'{count:,} {name}' for name, count in counts.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Start-up import time of the bot, measured with python -X importtime in a fresh interpreter. Prints the slowest
+imports and fails if the total exceeds the budget or if a module that should be imported lazily is loaded at start.
+
+    python benchmarks/importtime.py --budget 1500 --top 20
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+
+from common import ROOT, prepare_environment
+
+# heavy modules that the bot only needs for some commands
+LAZY_MODULES = ('numpy', 'pandas', 'PIL', 'requests')
+
+
+def measure_imports(module: str) -> list[tuple[str, int, int]]:
+    """
+    Returns (module, self time, cumulative time) of every import, with the times in microseconds.
+    """
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'Importing {module} failed:\n{result.stderr}')
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        # nested imports are indented under the module that imported them
+        imports.append((name[1:].rstrip(), int(self_time), int(cumulative)))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report the start-up import time of the bot.')
+    parser.add_argument('--module', default='start', help='module imported at start-up')
+    parser.add_argument('--budget', type=float, default=1500, help='allowed total import time in milliseconds')
+    parser.add_argument('--top', type=int, default=15, help='number of slowest imports to show')
+    args = parser.parse_args()
+    prepare_environment()
+    imports = measure_imports(args.module)
+    # top level imports are not indented, their cumulative times add up to the total
+    total = sum(cumulative for name, _, cumulative in imports if not name.startswith(' ')) / 1000
+    print(f'{"cumulative":>12} {"self":>10}  module')
+    for name, self_time, cumulative in sorted(imports, key=lambda x: x[2], reverse=True)[:args.top]:
+        print(f'{cumulative / 1000:>10.1f}ms {self_time / 1000:>8.1f}ms  {name.strip()}')
+    print(f'\nTotal: {total:.1f}ms, budget: {args.budget:.0f}ms')
+    eager = sorted({name.strip().split('.')[0] for name, _, _ in imports} & set(LAZY_MODULES))
+    failed = False
+    if eager:
+        print(f'Imported at start-up although they should be lazy: {", ".join(eager)}')
+        failed = True
+    if total > args.budget:
+        print('Start-up import time is over the budget!')
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
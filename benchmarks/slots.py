@@ -0,0 +1,59 @@
+"""
+Memory and attribute access time of the slotted domain classes against the same classes with a per-instance
+__dict__.
+
+    python benchmarks/slots.py
+"""
+from __future__ import annotations
+
+import timeit
+from datetime import datetime
+from pathlib import Path
+
+from common import prepare_environment, measure_memory
+
+prepare_environment()
+
+from modules.card_game import Card, CollectedCard, Collection, Cooldown, Rarity, SCQuestion  # noqa: E402
+from modules.classes import ArbitraryPick, Match3PLeague, Pick  # noqa: E402
+from modules.data import Map, Tier, WORLD_MAP_LIST  # noqa: E402
+from modules.queue import Queue  # noqa: E402
+
+INSTANCES = 100_000
+
+
+def with_dict(cls: type) -> type:
+    # same constructor and methods, but instances get a __dict__
+    namespace = {key: value for key, value in vars(cls).items() if key not in ('__slots__', *cls.__slots__)}
+    return type(f'{cls.__name__}WithDict', (), namespace)
+
+
+def main():
+    collection = Collection('Collection', ':snowflake:', 1., 0)
+    question = SCQuestion('Question?', 'Answer')
+    card = Card('Card', Rarity.COMMON, collection, Path('card.png'), question, None, 1.)
+    arbitrary_pick = ArbitraryPick([WORLD_MAP_LIST[0]], [WORLD_MAP_LIST[1]], [], [], None, None)
+    cases = {
+        Collection: (lambda i, cls: cls('Collection', ':snowflake:', 1., i), 'chance'),
+        Card: (lambda i, cls: cls(f'Card {i}', Rarity.COMMON, collection, Path('card.png'), question, None, 1.),
+               'rarity'),
+        CollectedCard: (lambda i, cls: cls(card, datetime.now(), 'UNGRADED'), 'grade'),
+        Cooldown: (lambda i, cls: cls(i, i, 1.), 'deadline'),
+        Match3PLeague: (lambda i, cls: cls(i, i + 1, Tier.A_TIER, 1), 'week'),
+        Pick: (lambda i, cls: cls(i, None, arbitrary_pick), 'user_id'),
+        Map: (lambda i, cls: cls('A Community World', 'https://www.geoguessr.com/maps/'), 'name'),
+        Queue: (lambda i, cls: cls('1v1'), 'pos'),
+    }
+    print(f'{"class":>16} {"dict bytes":>11} {"slots bytes":>12} {"dict ns":>8} {"slots ns":>9}')
+    for cls, (make, attribute) in cases.items():
+        results = []
+        for variant in (with_dict(cls), cls):
+            size, instances = measure_memory(lambda: [make(i, variant) for i in range(INSTANCES)])
+            obj = instances[0]
+            access = min(timeit.repeat(f'obj.{attribute}', globals={'obj': obj}, number=1_000_000, repeat=5))
+            results += [size / INSTANCES, access / 1_000_000 * 1e9]
+        print(f'{cls.__name__:>16} {results[0]:>11.0f} {results[2]:>12.0f} {results[1]:>8.1f} {results[3]:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+"""
+Benchmarks of the bot's hot paths on synthetic data at several scales. Results are written as JSON, and two result
+files can be compared to find regressions.
+
+    python benchmarks/suite.py run --scales small medium --output before.json
+    python benchmarks/suite.py run --scales small medium --output after.json
+    python benchmarks/suite.py compare before.json after.json --threshold 0.15
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import sys
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Callable
+
+from common import prepare_environment, measure_time
+from generate_data import generate
+
+# scale: (users, cards)
+SCALES = {'small': (10, 50), 'medium': (1000, 500), 'large': (100_000, 5000)}
+MATCHES_PER_TIER = 40
+COUNTRY_MESSAGE = ('was it france or belgium? looked like luxembourg to me, but the bollards said netherlands and '
+                   'the plates were from germany or maybe north macedonia ') * 4
+
+loop = asyncio.new_event_loop()
+benchmarks: dict[str, Callable[[SimpleNamespace], tuple[Callable[[], object], int]]] = {}
+
+
+def benchmark(name: str):
+    """
+    Registers a benchmark. The decorated function prepares it on the dataset and returns the function to time and
+    the number of calls per timed run.
+    """
+    def decorator(func):
+        benchmarks[name] = func
+        return func
+    return decorator
+
+
+def build_dataset(users: int, cards: int, cards_per_user: int, seed: int = 0) -> SimpleNamespace:
+    """
+    Generates the data files of the scale and loads them like the bot does.
+    """
+    from modules.data import Tier
+    from modules.initializer import card_game_manager, manager, queue_manager
+
+    generate(users, cards, cards_per_user=cards_per_user, league_players=2 * MATCHES_PER_TIER * len(Tier),
+             queues=1, queue_length=users, seed=seed)
+    card_game_manager.load()
+    manager.open_picks()
+    manager.open_matches()
+    queue_manager.open_queues()
+    queue = queue_manager.queues[0]
+    biggest = max(card_game_manager.collections, key=lambda x: len(card_game_manager.collections[x]))
+    return SimpleNamespace(users=users, cards=cards, manager=card_game_manager, pick_manager=manager, queue=queue,
+                           queued_user=queue.ids[-1], user_id=biggest,
+                           card=card_game_manager.cards_list[len(card_game_manager.cards_list) // 2])
+
+
+def run_coroutine(coroutine):
+    return loop.run_until_complete(coroutine)
+
+
+@benchmark('check_countries')
+def bench_check_countries(ds: SimpleNamespace):
+    from modules.functions import check_countries
+    return lambda: check_countries(COUNTRY_MESSAGE), 10
+
+
+@benchmark('choose_card')
+def bench_choose_card(ds: SimpleNamespace):
+    return ds.manager.choose_card, 1000
+
+
+@benchmark('open_collections')
+def bench_open_collections(ds: SimpleNamespace):
+    return ds.manager.open_collections, 1
+
+
+@benchmark('save_collections')
+def bench_save_collections(ds: SimpleNamespace):
+    return ds.manager.save_collections, 1
+
+
+@benchmark('add_collected_card')
+def bench_add_collected_card(ds: SimpleNamespace):
+    # a collect appends one line to the event log and saves a snapshot only periodically, the cards go to a user of
+    # their own to keep the other benchmarks unchanged
+    return lambda: ds.manager.add_collected_card(ds.card, ds.users + 1), 100
+
+
+@benchmark('get_overall_progress')
+def bench_get_overall_progress(ds: SimpleNamespace):
+    return lambda: ds.manager.get_overall_progress(ds.user_id), 10
+
+
+@benchmark('get_total')
+def bench_get_total(ds: SimpleNamespace):
+    return lambda: ds.manager.get_total(ds.card), 1
+
+
+@benchmark('autocomplete_cards')
+def bench_autocomplete_cards(ds: SimpleNamespace):
+    from modules.commands import cards_autocomplete
+    return lambda: run_coroutine(cards_autocomplete(None, 'pole 1')), 100
+
+
+@benchmark('autocomplete_user_cards')
+def bench_autocomplete_user_cards(ds: SimpleNamespace):
+    from modules.commands import card_autocomplete
+    interaction = SimpleNamespace(user=SimpleNamespace(id=ds.user_id))
+    return lambda: run_coroutine(card_autocomplete(interaction, 'card 1')), 100
+
+
+@benchmark('autocomplete_user_cards_cold')
+def bench_autocomplete_user_cards_cold(ds: SimpleNamespace):
+    from modules.commands import card_autocomplete
+    interaction = SimpleNamespace(user=SimpleNamespace(id=ds.user_id))
+
+    def search():
+        # a new card in the collection makes the index stale
+        ds.manager.update_collection_version(ds.user_id)
+        return run_coroutine(card_autocomplete(interaction, 'card 1'))
+    return search, 10
+
+
+@benchmark('paginate_render')
+def bench_paginate_render(ds: SimpleNamespace):
+    from modules.config_service import config_service
+    from modules.pagination import PageSource, render_page
+
+    def render():
+        items_per_page = config_service.snapshot.items_per_page
+        source = PageSource(ds.manager.display_collection(SimpleNamespace(id=ds.user_id), 'Rarity'))
+        total_pages = max(1, -(-source.count // items_per_page))
+        page = (total_pages + 1) // 2
+        offset = (page - 1) * items_per_page
+        return render_page(source.get_items(offset, items_per_page), offset, page, total_pages, 'Cards')
+    return render, 10
+
+
+@benchmark('get_who_picked_message')
+def bench_get_who_picked_message(ds: SimpleNamespace):
+    return lambda: ds.pick_manager.get_who_picked_message(None), 10
+
+
+@benchmark('queue_in_queue')
+def bench_queue_in_queue(ds: SimpleNamespace):
+    return lambda: ds.queue.in_queue(ds.queued_user), 100
+
+
+@benchmark('queue_leave')
+def bench_queue_leave(ds: SimpleNamespace):
+    def leave_and_join():
+        ds.queue.leave(ds.queued_user)
+        ds.queue.join(ds.queued_user)
+    return leave_and_join, 100
+
+
+def run(args: argparse.Namespace):
+    prepare_environment()
+    selected = args.benchmarks or list(benchmarks)
+    results = []
+    for scale in args.scales:
+        users, cards = SCALES[scale]
+        ds = build_dataset(users, cards, args.cards_per_user)
+        for name in selected:
+            func, number = benchmarks[name](ds)
+            seconds = measure_time(func, repeat=args.repeat, number=number)
+            results.append({'scale': scale, 'benchmark': name, 'seconds': seconds})
+            print(f'{scale:>8} {name:<30} {seconds * 1000:>12.4f}ms', file=sys.stderr)
+    report = {'created': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+              'cards_per_user': args.cards_per_user, 'repeat': args.repeat, 'results': results}
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+def compare(args: argparse.Namespace) -> bool:
+    """
+    Prints the change of every benchmark present in both runs.
+
+    :return: whether any benchmark got slower by more than the threshold
+    """
+    with open(args.baseline, 'r') as file:
+        baseline = {(r['scale'], r['benchmark']): r['seconds'] for r in json.load(file)['results']}
+    with open(args.candidate, 'r') as file:
+        candidate = {(r['scale'], r['benchmark']): r['seconds'] for r in json.load(file)['results']}
+    regressed = False
+    print(f'{"scale":>8} {"benchmark":<30} {"baseline":>12} {"candidate":>12} {"change":>8}')
+    for key in sorted(baseline.keys() & candidate.keys()):
+        old, new = baseline[key], candidate[key]
+        change = new / old - 1 if old > 0 else 0.
+        flag = ''
+        if change > args.threshold:
+            flag = '  REGRESSION'
+            regressed = True
+        elif change < -args.threshold:
+            flag = '  improved'
+        print(f'{key[0]:>8} {key[1]:<30} {old * 1000:>10.4f}ms {new * 1000:>10.4f}ms {change:>+8.1%}{flag}')
+    for key in sorted(baseline.keys() ^ candidate.keys()):
+        print(f'{key[0]:>8} {key[1]:<30} only in {"baseline" if key in baseline else "candidate"}')
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the hot paths of the bot.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help='run the benchmarks and write the results as JSON')
+    run_parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=['small', 'medium'])
+    run_parser.add_argument('--benchmarks', nargs='+', choices=list(benchmarks), help='default: all of them')
+    run_parser.add_argument('--cards-per-user', type=int, default=10)
+    run_parser.add_argument('--repeat', type=int, default=5, help='timed runs of every benchmark, the best is kept')
+    run_parser.add_argument('--output', help='file for the results, printed if not given')
+    compare_parser = subparsers.add_parser('compare', help='compare two result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    compare_parser.add_argument('--threshold', type=float, default=0.1,
+                                help='relative slowdown reported as a regression')
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    else:
+        sys.exit(1 if compare(args) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Message activity of the channels and the card spawns driven by it. Every channel keeps its message counts of the last
+minutes in a ring buffer and a moving average of its message rate, so tracking costs the same at any traffic.
+"""
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from typing import Dict
+
+import discord
+
+from modules.config_service import config_service
+from modules.logger import logger
+
+BUCKET_SECONDS = 60
+BUCKET_COUNT = 60
+HALF_LIFE = 5
+ACTIVE_MINUTES = 10
+
+
+class ChannelActivity:
+    """
+    Message counts of the last BUCKET_COUNT minutes and an exponentially weighted moving average of the messages per
+    minute, which a finished minute is added to. A minute counts half as much after HALF_LIFE minutes.
+    """
+    def __init__(self, bucket: int):
+        self.counts = [0] * BUCKET_COUNT
+        self.bucket = bucket
+        self.rate = 0.
+
+    def advance(self, bucket: int, alpha: float):
+        elapsed = bucket - self.bucket
+        if elapsed <= 0:
+            return
+        # the current minute is finished, the ones after it had no messages
+        self.rate += alpha * (self.counts[self.bucket % BUCKET_COUNT] - self.rate)
+        self.rate *= (1 - alpha) ** (elapsed - 1)
+        for idx in range(self.bucket + 1, self.bucket + 1 + min(elapsed, BUCKET_COUNT)):
+            self.counts[idx % BUCKET_COUNT] = 0
+        self.bucket = bucket
+
+    def count_recent(self, minutes: int) -> int:
+        """
+        The number of messages in the current minute and the minutes before it.
+        """
+        return sum(self.counts[idx % BUCKET_COUNT] for idx in range(self.bucket - min(minutes, BUCKET_COUNT) + 1,
+                                                                     self.bucket + 1))
+
+
+class ActivityTracker:
+    def __init__(self, half_life: float = HALF_LIFE):
+        self.alpha = 1 - 0.5 ** (1 / half_life)
+        self.channels: Dict[int, ChannelActivity] = {}
+
+    @staticmethod
+    def get_bucket(now: float | None = None) -> int:
+        return int((time.time() if now is None else now) // BUCKET_SECONDS)
+
+    def record(self, channel_id: int, now: float | None = None):
+        bucket = self.get_bucket(now)
+        activity = self.channels.get(channel_id)
+        if activity is None:
+            activity = self.channels[channel_id] = ChannelActivity(bucket)
+        activity.advance(bucket, self.alpha)
+        activity.counts[bucket % BUCKET_COUNT] += 1
+
+    def get_rate(self, channel_id: int, now: float | None = None) -> float:
+        """
+        The average number of messages per minute in the channel, up to the last finished minute. It is 0 if the
+        channel had no messages in the last ACTIVE_MINUTES minutes, the average only fades and never gets there.
+        """
+        activity = self.channels.get(channel_id)
+        if activity is None:
+            return 0.
+        activity.advance(self.get_bucket(now), self.alpha)
+        return activity.rate if activity.count_recent(ACTIVE_MINUTES) > 0 else 0.
+
+
+class SpawnScheduler:
+    """
+    Spawns cards at an average of `card spawns per hour`, however many messages are sent. The time to the next spawn
+    is the card timeout plus a time drawn from an exponential distribution, so spawns stay unpredictable. A spawn
+    that is due waits for activity in a spawn channel and goes to a channel chosen by its activity times its weight.
+    With `card spawns per hour` set to 0, cards spawn after messages with the chance of 1 in `card spawn rate`
+    instead.
+    """
+    def __init__(self, tracker: ActivityTracker, manager, interval: float = 10.):
+        self.tracker = tracker
+        self.manager = manager
+        self.interval = interval
+        self.next_spawn: float | None = None
+        self.scheduled_rate = 0.
+
+    @property
+    def enabled(self) -> bool:
+        return config_service.snapshot.spawns_per_hour > 0
+
+    def schedule(self, now: float):
+        snapshot = config_service.snapshot
+        self.scheduled_rate = snapshot.spawns_per_hour
+        gap = 3600 / self.scheduled_rate
+        # the card timeout is part of the average gap, otherwise spawns blocked by it would lower the rate
+        timeout = min(snapshot.card_timeout, gap)
+        self.next_spawn = now + timeout + (random.expovariate(1 / (gap - timeout)) if gap > timeout else 0.)
+
+    def choose_channel(self, active_only: bool = False) -> discord.TextChannel | None:
+        """
+        Chooses a spawn channel with the chance of its activity times its weight, or of its weight alone if none of
+        the channels are active.
+
+        :param active_only: return None instead of ignoring the activity if none of the channels are active
+        """
+        channels, weights = self.manager.channels, self.manager.channel_weights
+        if not channels:
+            return None
+        live = [weight * self.tracker.get_rate(channel.id) for channel, weight in zip(channels, weights)]
+        if sum(live) > 0:
+            weights = live
+        elif active_only:
+            return None
+        return random.choices(population=channels, weights=weights, k=1)[0]
+
+    async def tick(self, now: float | None = None) -> bool:
+        """
+        :return: whether a card spawned
+        """
+        if not self.enabled or self.manager.channels is None:
+            self.next_spawn = None
+            return False
+        now = time.monotonic() if now is None else now
+        if self.next_spawn is None or self.scheduled_rate != config_service.snapshot.spawns_per_hour:
+            self.schedule(now)
+        if now < self.next_spawn or not self.manager.timeout_check():
+            return False
+        channel = self.choose_channel(active_only=True)
+        if channel is None:
+            # nobody would see the card, the spawn waits for the next message
+            return False
+        # the next spawn is drawn from now, so spawns missed while waiting don't come in a burst
+        self.schedule(now)
+        return await self.manager.play(channel)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error('Scheduled card spawn failed: %r', e)
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Callable, Dict, Hashable, Iterable
+
+from discord import app_commands
+
+MAX_CHOICES = 25
+
+
+class AutocompleteIndex:
+    """
+    Search index over a fixed set of choices. Matches are ranked as prefix matches first, then matches at the start
+    of a word, then substring matches and finally subsequence matches, and the search stops once enough are found.
+
+    Prefixes and word starts are found by binary search over sorted keys, substrings through a trigram index and
+    subsequences only among the choices containing every character of the query.
+    """
+    def __init__(self, entries: Iterable[tuple[str, str | int]]):
+        self.names: list[str] = []
+        self.values: list[str | int] = []
+        self.keys: list[str] = []
+        for name, value in entries:
+            self.names.append(name)
+            self.values.append(value)
+            self.keys.append(name.lower())
+        self.prefixes = sorted((key, idx) for idx, key in enumerate(self.keys))
+        self.word_starts = sorted((key[start:], idx) for idx, key in enumerate(self.keys)
+                                  for start in word_starts(key) if start > 0)
+        self.trigrams: Dict[str, set[int]] = {}
+        self.characters: Dict[str, set[int]] = {}
+        for idx, key in enumerate(self.keys):
+            for start in range(len(key) - 2):
+                self.trigrams.setdefault(key[start:start + 3], set()).add(idx)
+            for char in key:
+                self.characters.setdefault(char, set()).add(idx)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def search(self, query: str, limit: int = MAX_CHOICES) -> list[tuple[str, str | int]]:
+        query = query.lower()
+        if query == '':
+            return list(zip(self.names[:limit], self.values[:limit]))
+        found: list[int] = []
+        seen: set[int] = set()
+
+        def add(_idx: int) -> bool:
+            if _idx not in seen:
+                seen.add(_idx)
+                found.append(_idx)
+            return len(found) >= limit
+
+        for sorted_keys in (self.prefixes, self.word_starts):
+            pos = bisect_left(sorted_keys, (query, -1))
+            while pos < len(sorted_keys) and sorted_keys[pos][0].startswith(query):
+                if add(sorted_keys[pos][1]):
+                    return self.get_choices(found)
+                pos += 1
+        for idx in self.get_candidates(query, substring=True):
+            if query in self.keys[idx] and add(idx):
+                return self.get_choices(found)
+        for idx in self.get_candidates(query, substring=False):
+            if idx not in seen and is_subsequence(query, self.keys[idx]) and add(idx):
+                return self.get_choices(found)
+        return self.get_choices(found)
+
+    def get_candidates(self, query: str, substring: bool) -> list[int]:
+        if substring and len(query) >= 3:
+            postings = [self.trigrams.get(query[start:start + 3], set()) for start in range(len(query) - 2)]
+        else:
+            postings = [self.characters.get(char, set()) for char in set(query)]
+        postings.sort(key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        return sorted(candidates)
+
+    def get_choices(self, found: list[int]) -> list[tuple[str, str | int]]:
+        return [(self.names[idx], self.values[idx]) for idx in found]
+
+
+class AutocompleteSource:
+    """
+    Keeps an AutocompleteIndex over the entries given by a function and rebuilds it only when the version given
+    by the other function changes.
+    """
+    def __init__(self, get_entries: Callable[[], Iterable[tuple[str, str | int]]],
+                 get_version: Callable[[], Hashable] = lambda: None):
+        self.get_entries = get_entries
+        self.get_version = get_version
+        self.version = None
+        self.index: AutocompleteIndex | None = None
+
+    def get_index(self) -> AutocompleteIndex:
+        version = self.get_version()
+        if self.index is None or version != self.version:
+            self.index = AutocompleteIndex(self.get_entries())
+            self.version = version
+        return self.index
+
+    def search(self, query: str, limit: int = MAX_CHOICES) -> list[app_commands.Choice]:
+        return [app_commands.Choice(name=name, value=value) for name, value in self.get_index().search(query, limit)]
+
+
+def word_starts(key: str) -> list[int]:
+    return [idx for idx, char in enumerate(key) if char.isalnum() and (idx == 0 or not key[idx - 1].isalnum())]
+
+
+def is_subsequence(substring: str, source: str) -> bool:
+    chars = iter(source)
+    return all(char in chars for char in substring)
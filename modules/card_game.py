@@ -1,21 +1,39 @@
 from __future__ import annotations
 
 import asyncio
+import bisect
 import hashlib
+import itertools
 import json
+import math
 import random
+import sys
+import time
+import unicodedata
+import weakref
+from array import array
+from collections import Counter, OrderedDict
 from datetime import datetime, timedelta
 from enum import IntEnum
 from pathlib import Path, PureWindowsPath
-from typing import Dict
+from io import BytesIO
+from typing import Dict, Sequence, TYPE_CHECKING
 
 import discord
-from PIL import Image, ImageDraw, ImageFont
 
 import modules.functions as funcs
-from modules.data import TIMEOUT, BUTTON_LIFETIME, Emoji, ANSWER_TIMEOUT, SpawnRate
+import modules.metrics as metrics
+from modules.events import EventLog, EventType
+from modules.config_service import config_service, ConfigSnapshot
+from modules.data import Emoji, SpawnRate, GALLERY_THUMBNAIL_SIZE, GALLERY_MAX_COLUMNS, \
+    GALLERY_MAX_CARDS, GALLERY_CACHE_SIZE, MAX_LIVE_SPAWNS, SNAPSHOT_INTERVAL
+from modules.leaderboard import Leaderboard, Metric
+from modules.pagination import MappedSequence
 from modules.logger import logger
 
+if TYPE_CHECKING:
+    from PIL import Image
+
 
 class ElementNotFoundError(Exception):
     def __init__(self, msg: str):
@@ -55,7 +73,12 @@ def get_rarity(rarity: str | int) -> Rarity:
     return r
 
 
+UNGRADED = 'UNGRADED'
+
+
 class Collection:
+    __slots__ = ('name', 'emoji', 'chance', 'id')
+
     def __init__(self, name: str, emoji: str, chance: float, collection_id: int = None):
         self.name = name
         self.emoji = emoji
@@ -92,8 +115,7 @@ class Collection:
             dct = json.load(file)
         _id = dct['current_collection_id']
         dct['current_collection_id'] += 1
-        with open(Path('data', 'config.json'), 'w+') as file:
-            json.dump(dct, file)
+        funcs.save_json(Path('data', 'config.json'), dct)
         return _id
 
 
@@ -121,31 +143,107 @@ class SCQuestion(Question):
         self.text = text
         self.answer_repr = answer
         self.correct_answers = answer.split(';')
+        self.normalized_answers = frozenset(filter(None, map(get_answer_key, self.correct_answers)))
 
-    def check_answer(self, given: str) -> bool:
-        return given.lower() in [i.lower() for i in self.correct_answers]
+    def check_answer(self, given: str, tolerance: int | None = None) -> bool:
+        if tolerance is None:
+            tolerance = config_service.snapshot.answer_tolerance
+        given = get_answer_key(given)
+        if given in self.normalized_answers:
+            return True
+        return tolerance > 0 and any(len(answer) > 2 * tolerance and within_edit_distance(given, answer, tolerance)
+                                     for answer in self.normalized_answers)
 
 
 class MCQuestion(Question):
     def __init__(self, text: str, answer: str):
         super(MCQuestion, self).__init__(QuestionType.MULTIPLECHOICE)
         self.answer_repr = answer
-        answers = answer.split(';')
-        for i in answers:
-            while i[0] == ' ':
-                i = i[1:]
+        answers = [i.strip() for i in answer.split(';')]
         self.text = text
         self.correct_answer = answers[0]
         self.incorrect_answers = answers[1:]
-        self.answer = self.correct_answer
-        for i in self.incorrect_answers:
-            self.answer += f';{i}'
+        self.answer = ';'.join(answers)
 
     def check_answer(self, given: str) -> bool:
-        return self.correct_answer.lower() == given.lower()
+        # the answer is one of the options of the select menu, it is never typed
+        return given == self.correct_answer
+
+
+def normalize_answer(answer: str) -> str:
+    """
+    Brings an answer to the form in which answers are compared: case folded, without accents, with punctuation
+    replaced by spaces (apostrophes are dropped) and with single spaces between words.
+    """
+    chars = []
+    for char in unicodedata.normalize('NFKD', answer.casefold()):
+        if unicodedata.combining(char) or char in '\'`’':
+            continue
+        chars.append(' ' if unicodedata.category(char)[0] in 'PSZC' else char)
+    return ' '.join(''.join(chars).split())
+
+
+def get_answer_key(answer: str) -> str:
+    """
+    The normalized answer, or the case folded answer if it is made only of emoji and punctuation, which normalization
+    would remove entirely.
+    """
+    return normalize_answer(answer) or ' '.join(answer.casefold().split())
+
+
+def within_edit_distance(first: str, second: str, limit: int) -> bool:
+    """
+    Checks whether the Levenshtein distance between two strings is at most the given limit. Only the diagonal band
+    of width 2 * limit + 1 is computed and the check stops as soon as the whole band exceeds the limit.
+    """
+    if abs(len(first) - len(second)) > limit:
+        return False
+    if len(first) > len(second):
+        first, second = second, first
+    over = limit + 1
+    previous = [j if j <= limit else over for j in range(len(second) + 1)]
+    for i in range(1, len(first) + 1):
+        current = [over] * (len(second) + 1)
+        if i <= limit:
+            current[0] = i
+        for j in range(max(1, i - limit), min(len(second), i + limit) + 1):
+            cost = first[i - 1] != second[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost, over)
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+def find_answer_collisions(cards: list[Card]) -> list[str]:
+    """
+    Finds questions whose answers can't be told apart: empty answers, correct answers of single choice questions that
+    are the same after normalization and repeated options of multiple choice questions, which are compared exactly.
+    """
+    problems = []
+    for card in cards:
+        question = card.question
+        if question.type == QuestionType.SINGLECHOICE:
+            answers = question.correct_answers
+            get_key = get_answer_key
+        else:
+            answers = [question.correct_answer] + question.incorrect_answers
+            get_key = str.strip
+        seen: Dict[str, str] = {}
+        for answer in answers:
+            key = get_key(answer)
+            if key == '':
+                problems.append(f'***{card.name}***: answer "{answer}" is empty')
+            elif key in seen:
+                problems.append(f'***{card.name}***: answers "{seen[key]}" and "{answer}" can\'t be told apart')
+            else:
+                seen[key] = answer
+    return problems
 
 
 class Card:
+    __slots__ = ('name', 'rarity', 'collection', 'image_path', 'question', 'chance', 'id')
+
     def __init__(self, name: str, rarity: Rarity, collection: Collection, image_path: Path, question: Question,
                  card_id: int | None, chance: float | None):
         self.name = name
@@ -164,8 +262,8 @@ class Card:
         # val = "ULTRACOMMON"
         else:
             val = rarity.value
-        self.id = hashlib.sha3_256(f'{name}-{val}-{collection.id}'.encode('utf-8')).hexdigest() if card_id is None \
-            else card_id
+        self.id = sys.intern(hashlib.sha3_256(f'{name}-{val}-{collection.id}'.encode('utf-8')).hexdigest()
+                             if card_id is None else card_id)
 
     def __eq__(self, other: Card):
         return isinstance(other, Card) and other.id == self.id
@@ -175,6 +273,8 @@ class Card:
 
 
 class CollectedCard:
+    __slots__ = ('card', 'id', 'date', 'grade')
+
     def __init__(self, card: Card, date: datetime, grade: str | float):
         self.card = card
         self.id = card.id
@@ -189,21 +289,198 @@ class CollectedCard:
         card = self.card
         name = f'{card.name} ({card.collection.name} Collection, {card.rarity.name.capitalize()})'
         if include_grade:
-            name += ', Grade: ' if self.grade != 'UNGRADED' else ', '
+            name += ', Grade: ' if self.grade != UNGRADED else ', '
             name += f'{self.grade}'
         return name
 
 
+class CardCatalog:
+    """
+    Append-only numbering of every card the collections refer to, including cards that were removed from the card
+    list, so that collected cards can be stored as small integers.
+    """
+    def __init__(self, cards: list[Card] = ()):
+        self.cards: list[Card] = []
+        self.index: Dict[str, int] = {}
+        for card in cards:
+            self.add(card)
+
+    def add(self, card: Card) -> int:
+        idx = self.index.get(card.id)
+        if idx is None:
+            idx = self.index[card.id] = len(self.cards)
+            self.cards.append(card)
+        else:
+            self.cards[idx] = card
+        return idx
+
+    def get_index(self, card: Card) -> int:
+        idx = self.index.get(card.id)
+        return self.add(card) if idx is None else idx
+
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def date_to_int(date: datetime) -> int:
+    if date.tzinfo is not None:
+        date = date.astimezone().replace(tzinfo=None)
+    return (date - EPOCH) // MICROSECOND
+
+
+def int_to_date(value: int) -> datetime:
+    return EPOCH + value * MICROSECOND
+
+
+class UserCollection:
+    """
+    Cards collected by one user, stored column-wise: catalog indices as int32, collection dates as int64
+    microseconds since the epoch and grades as float32 with NaN for ungraded cards. Indexing and iterating give
+    CollectedCardView objects that behave like CollectedCard, so callers can treat it as a list of collected cards.
+
+    Every card also gets a handle, a per-user sequence number that never changes or gets reused, so that a card
+    chosen in autocomplete can be found even if the list changes before the command is submitted. Handles only
+    increase along the rows, so they are found by bisection without an index that would cost more than the rows.
+    """
+    def __init__(self, catalog: CardCatalog):
+        self.catalog = catalog
+        self.cards = array('i')
+        self.dates = array('q')
+        self.grades = array('f')
+        self.handles = array('i')
+        self.next_handle = 0
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    def __getitem__(self, idx: int | slice) -> CollectedCardView | list[CollectedCardView]:
+        if isinstance(idx, slice):
+            return [CollectedCardView(self, i) for i in range(*idx.indices(len(self.cards)))]
+        if idx < 0:
+            idx += len(self.cards)
+        if not 0 <= idx < len(self.cards):
+            raise IndexError('Collection index out of range')
+        return CollectedCardView(self, idx)
+
+    def __iter__(self):
+        return (CollectedCardView(self, idx) for idx in range(len(self.cards)))
+
+    def __contains__(self, collected_card: CollectedCard) -> bool:
+        return any(collected_card == _card for _card in self)
+
+    def add(self, card: Card, date: datetime, grade: str | float, handle: int | None = None):
+        self.add_row(self.catalog.get_index(card), date_to_int(date), grade_to_float(grade), handle)
+
+    def add_row(self, card_idx: int, date: int, grade: float, handle: int | None = None):
+        if handle is None or handle < self.next_handle:
+            handle = self.next_handle
+        self.next_handle = handle + 1
+        self.cards.append(card_idx)
+        self.dates.append(date)
+        self.grades.append(grade)
+        self.handles.append(handle)
+
+    def get_by_handle(self, handle: int) -> CollectedCardView | None:
+        position = bisect.bisect_left(self.handles, handle)
+        if position == len(self.handles) or self.handles[position] != handle:
+            return None
+        return CollectedCardView(self, position)
+
+    def append(self, collected_card: CollectedCard):
+        self.add(collected_card.card, collected_card.date, collected_card.grade)
+
+    def count(self, card: Card) -> int:
+        idx = self.catalog.index.get(card.id)
+        return 0 if idx is None else self.cards.count(idx)
+
+
+class CollectedCardView(CollectedCard):
+    __slots__ = ('collection', 'idx')
+
+    def __init__(self, collection: UserCollection, idx: int):
+        self.collection = collection
+        self.idx = idx
+
+    @property
+    def card(self) -> Card:
+        return self.collection.catalog.cards[self.collection.cards[self.idx]]
+
+    @property
+    def id(self) -> str:
+        return self.card.id
+
+    @property
+    def handle(self) -> int:
+        return self.collection.handles[self.idx]
+
+    @property
+    def date(self) -> datetime:
+        return int_to_date(self.collection.dates[self.idx])
+
+    @property
+    def grade(self) -> str | float:
+        return float_to_grade(self.collection.grades[self.idx])
+
+    @grade.setter
+    def grade(self, grade: str | float):
+        self.collection.grades[self.idx] = grade_to_float(grade)
+
+
+def grade_to_float(grade: str | float) -> float:
+    return math.nan if grade == UNGRADED else grade
+
+
+def float_to_grade(value: float) -> str | float:
+    # grades are stored as float32, rounding brings back the one decimal digit they are given with
+    return UNGRADED if math.isnan(value) else round(value, 1)
+
+
 class CardGameManager:
-    def __init__(self, message_threshold: int):
+    def __init__(self):
         self.channels = None
         self.channel_weights = None
+        self.collections_list: list[Collection] = []
+        self.cards_list: list[Card] = []
+        self.catalog = CardCatalog(self.cards_list)
+        self.collections: Dict[int, UserCollection] = {}
+        self.timeout = datetime.now()
+        self.cooldowns = CooldownStore(sweep_interval=config_service.snapshot.answer_timeout)
+        self.next_spawn_id = 1
+        self.pending_spawns: list[dict] = []
+        self.views = CardViewRegistry(MAX_LIVE_SPAWNS)
+        self.leaderboard = Leaderboard({}, get_rarity_weights())
+        self.leaderboard_task: asyncio.Task | None = None
+        self.leaderboard_outdated = False
+        # cards collected while a new leaderboard is built in a thread, they are added to it before it is used
+        self.pending_collects: list[tuple[int, Card, bool, bool]] | None = None
+        self.collection_versions: Dict[int, int] = {}
+        self.catalog_version = 0
+        self.gallery_cache: OrderedDict[tuple[int, int | None], tuple[tuple[int, int], bytes]] = OrderedDict()
+        self.spawn_weights: tuple[tuple[int, int], list[float]] | None = None
+        self.ownership: Dict[str, int] = {}
+        self.events = EventLog(Path('data', 'events.jsonl'), Path('data', 'events'))
+        self.snapshot_seq = 0
+        self.events.subscribe(EventType.COLLECT, self.apply_collect)
+        self.events.subscribe(EventType.COLLECT, self.count_collect)
+        self.events.subscribe(EventType.GRADE, self.apply_grade)
+
+    def load(self):
+        """
+        Reads the collections, cards and the snapshot of the collected cards from disk and replays the events logged
+        after the snapshot. It only does blocking work, so the client runs it in a thread while connecting to the
+        gateway.
+        """
         self.collections_list = self.open_collections_list()
         self.cards_list = self.open_cards()
-        self.message_threshold = message_threshold
-        self.collections = self.open_collections()
-        self.timeout = datetime.now()
-        self.cooldowns: list[Cooldown] = []
+        self.catalog = CardCatalog(self.cards_list)
+        self.snapshot_seq, self.collections = self.open_collections()
+        self.next_spawn_id, self.pending_spawns = self.open_spawns()
+        self.update_catalog_version()
+        self.events.close()
+        replayed = self.events.replay(self.snapshot_seq)
+        if replayed > 0:
+            logger.info('Replayed %d card game events logged after the snapshot', replayed)
 
     @staticmethod
     def open_collections_list() -> list[Collection]:
@@ -219,8 +496,7 @@ class CardGameManager:
         for collection in self.collections_list:
             lst.append({'name': collection.name, 'emoji': collection.emoji, 'chance': collection.chance,
                         'id': collection.id})
-        with open(Path('data', 'collections_list.json'), 'w+') as file:
-            json.dump(lst, file)
+        funcs.save_json(Path('data', 'collections_list.json'), lst)
 
     def get_collection(self, name: str) -> Collection:
         for collection in self.collections_list:
@@ -251,29 +527,23 @@ class CardGameManager:
                             Path(PureWindowsPath(card['path'])), q, chance=chance, card_id=card_id))
         return lst
 
+    def validate_answers(self) -> list[str]:
+        return find_answer_collisions(self.cards_list)
+
     def check_collection_exists(self, name: str) -> bool:
         return name in [n.name for n in self.collections_list]
 
     def get_total(self, card: Card) -> int:
-        total = 0
-        for user_id, collection in self.collections.items():
-            for _card in collection:
-                if _card.card == card:
-                    total += 1
-        return total
+        return self.ownership.get(card.id, 0)
 
     def get_player_total(self, card: Card, user_id: int) -> int:
-        total = 0
-        collection = self.collections[user_id]
-        for _card in collection:
-            if _card.card == card:
-                total += 1
-        return total
+        return self.collections[user_id].count(card)
 
     @staticmethod
     def get_image(card: CollectedCard) -> Image.Image:
+        from PIL import Image, ImageDraw, ImageFont
         image = Image.open(card.card.image_path)
-        if card.grade == 'UNGRADED':
+        if card.grade == UNGRADED:
             return image
         grade_path = Path('data', 'grade.png')
         grade = Image.open(grade_path)
@@ -283,6 +553,63 @@ class CardGameManager:
         draw.text((175, 932), f'{"{:10.1f}".format(card.grade)}', (0, 0, 0), font=font)
         return image
 
+    async def get_gallery(self, user_id: int, collection: Collection | None = None) -> bytes:
+        """
+        Returns a PNG grid with thumbnails of the cards owned by the user, optionally only from one collection.
+        It is rendered in a thread and cached until the user's collection or the card catalog changes, the most
+        recently used GALLERY_CACHE_SIZE galleries are kept.
+        """
+        key = (user_id, None if collection is None else collection.id)
+        version = (self.collection_versions.get(user_id, 0), self.catalog_version)
+        cached = self.gallery_cache.get(key)
+        if cached is not None and cached[0] == version:
+            self.gallery_cache.move_to_end(key)
+            return cached[1]
+        # the cards are copied here, the thread can't read the collection while new cards are added to it
+        rendered = await asyncio.to_thread(self.render_gallery_png, self.get_gallery_cards(user_id, collection))
+        self.gallery_cache[key] = (version, rendered)
+        self.gallery_cache.move_to_end(key)
+        while len(self.gallery_cache) > GALLERY_CACHE_SIZE:
+            self.gallery_cache.popitem(last=False)
+        return rendered
+
+    def get_gallery_cards(self, user_id: int, collection: Collection | None = None) -> list[CollectedCard]:
+        """
+        Copies of the user's cards to show in the gallery, one per distinct card with its best grade.
+        """
+        best: Dict[str, CollectedCard] = {}
+        for collected_card in self.collections.get(user_id, []):
+            if collection is not None and collected_card.card.collection != collection:
+                continue
+            other = best.get(collected_card.id)
+            if other is None or grade_value(collected_card.grade) > grade_value(other.grade):
+                best[collected_card.id] = collected_card
+        return [CollectedCard(x.card, x.date, x.grade)
+                for x in sorted(best.values(), key=lambda x: (x.card.collection.id, -x.card.rarity.value, x.card.name))]
+
+    def render_gallery_png(self, collected_cards: list[CollectedCard]) -> bytes:
+        image = self.render_gallery(collected_cards)
+        with BytesIO() as image_binary:
+            image.save(image_binary, 'PNG')
+            return image_binary.getvalue()
+
+    def render_gallery(self, collected_cards: list[CollectedCard]) -> Image.Image:
+        from PIL import Image
+        if len(collected_cards) == 0:
+            raise UserHasNoCardsError()
+        collected_cards = collected_cards[:GALLERY_MAX_CARDS]
+        width, height = GALLERY_THUMBNAIL_SIZE
+        columns = min(GALLERY_MAX_COLUMNS, math.ceil(math.sqrt(len(collected_cards))))
+        rows = math.ceil(len(collected_cards) / columns)
+        gallery = Image.new('RGBA', (columns * width, rows * height), (0, 0, 0, 0))
+        for idx, collected_card in enumerate(collected_cards):
+            thumbnail = self.get_image(collected_card).convert('RGBA')
+            thumbnail.thumbnail(GALLERY_THUMBNAIL_SIZE)
+            x = (idx % columns) * width + (width - thumbnail.width) // 2
+            y = (idx // columns) * height + (height - thumbnail.height) // 2
+            gallery.paste(thumbnail, (x, y), thumbnail)
+        return gallery
+
     def check_card_exists(self, card_id: int) -> bool:
         return card_id in [n.id for n in self.cards_list]
 
@@ -296,71 +623,292 @@ class CardGameManager:
             lst.append(prob*card.chance*card.collection.chance)
         return lst
 
-    async def send_card(self, card: Card, question: Question):
+    async def send_card(self, card: Card, question: Question, channel: discord.TextChannel | None = None) -> bool:
+        """
+        Spawns the card in the given channel or in a random spawn channel by the channel weights.
+
+        :return: whether the card spawned, it doesn't during the card timeout
+        """
         if self.timeout_check():
             view = CollectButtonView(question, self, card)
-            channel = random.choices(population=self.channels, weights=self.channel_weights, k=1)[0]
+            if channel is None:
+                channel = random.choices(population=self.channels, weights=self.channel_weights, k=1)[0]
             cnt = 'A new card appeared!'
             view.set_message(await channel.send(file=discord.File(card.image_path), content=cnt, view=view))
-            self.timeout = datetime.now() + timedelta(seconds=TIMEOUT)
-            await self.start_timer(view)
+            metrics.CARD_SPAWNS.inc(card.rarity.name.lower())
+            self.log_event(EventType.SPAWN, card=card.id, spawn=view.spawn_id, channel=channel.id)
+            self.timeout = datetime.now() + timedelta(seconds=config_service.snapshot.card_timeout)
+            for evicted in self.views.register_spawn(view):
+                await evicted.button.deactivate(True)
+            self.start_timer(view)
+            self.save_spawns()
+            return True
+        return False
 
     def timeout_check(self):
         return self.timeout <= datetime.now()
 
-    @staticmethod
-    async def start_timer(view: CollectButtonView):
+    def start_timer(self, view: CollectButtonView, lifetime: float | None = None):
+        lifetime = config_service.snapshot.card_lifetime if lifetime is None else lifetime
+        view.expires = time.time() + lifetime
+
         async def disable_button():
-            await asyncio.sleep(BUTTON_LIFETIME)
-            await view.button.deactivate(True)
+            await asyncio.sleep(lifetime)
+            if self.views.is_live(view.spawn_id):
+                await view.button.deactivate(True)
 
-        await asyncio.create_task(disable_button())
+        self.views.set_timer(view.spawn_id, asyncio.create_task(disable_button()))
 
-    async def play(self):
+    @staticmethod
+    def open_spawns() -> tuple[int, list[dict]]:
+        """
+        Reads the spawns that were live when the bot stopped.
+
+        :return: the next spawn ID and the spawns
+        """
+        path = Path('data', 'spawns.json')
+        if not path.exists():
+            return 1, []
+        with open(path, 'r') as file:
+            dct = json.load(file)
+        return dct['next_spawn_id'], dct['spawns']
+
+    def save_spawns(self):
+        """
+        Saves the live spawns and the spawn ID counter, so that the spawns can be recovered after a restart. It runs
+        whenever a card spawns, is collected or despawns. Spawns of the previous run that aren't recovered yet are
+        kept as they are.
+        """
+        spawns = list(self.pending_spawns)
+        spawns += [{'spawn': view.spawn_id, 'card': view.card.id, 'channel': view.message.channel.id,
+                    'message': view.message.id, 'expires': view.expires}
+                   for view in self.views.spawns.values() if view.message is not None]
+        funcs.save_json(Path('data', 'spawns.json'), {'next_spawn_id': self.next_spawn_id, 'spawns': spawns})
+
+    async def recover_spawns(self, client: discord.Client):
+        """
+        Re-attaches the spawns that were live when the bot stopped to their messages and despawns the ones that
+        expired in the meantime.
+        """
+        pending = list(self.pending_spawns)
+        recovered = 0
+        for spawn in pending:
+            # a spawn stays pending until it is handled, in case the bot stops during the recovery
+            try:
+                channel = await funcs.get_channel_by_id(client, spawn['channel'])
+            except discord.HTTPException as e:
+                logger.warning('Could not recover spawn %d, its channel is not available: %r', spawn['spawn'], e)
+                self.pending_spawns.remove(spawn)
+                continue
+            message = channel.get_partial_message(spawn['message'])
+            idx = self.catalog.index.get(spawn['card'])
+            lifetime = spawn['expires'] - time.time()
+            if idx is None or lifetime <= 0:
+                await expire_spawn_message(message)
+                self.pending_spawns.remove(spawn)
+                continue
+            card = self.catalog.cards[idx]
+            view = CollectButtonView(card.question, self, card, spawn_id=spawn['spawn'])
+            view.set_message(message)
+            client.add_view(view, message_id=message.id)
+            self.pending_spawns.remove(spawn)
+            evicted = self.views.register_spawn(view)
+            self.start_timer(view, lifetime)
+            for _view in evicted:
+                await _view.button.deactivate(True)
+            recovered += 1
+        self.save_spawns()
+        if len(pending) > 0:
+            logger.info('Recovered %d of %d spawns, the others had expired', recovered, len(pending))
+
+    async def shutdown(self):
+        """
+        Saves everything needed to continue after a restart: the live spawns, which stay collectable, and a snapshot
+        of the collections so that the next start replays no events.
+        """
+        self.save_spawns()
+        if self.events.seq > self.snapshot_seq:
+            self.save_collections()
+        self.events.close()
+
+    async def play(self, channel: discord.TextChannel | None = None) -> bool:
         try:
             card = self.choose_card()
-            await self.send_card(card, card.question)
+            return await self.send_card(card, card.question, channel)
         except ValueError as e:
             logger.error(e)
+            return False
 
     def choose_card(self) -> Card:
-        prob_list = self.configure_prob_list()
-        for prob in prob_list:
-            if prob < 0:
+        return random.choices(population=self.cards_list, cum_weights=self.get_spawn_weights(), k=1)[0]
+
+    def get_spawn_weights(self) -> list[float]:
+        """
+        Cumulative spawn weights of the cards. They are checked and rebuilt only after the catalog or the config
+        changes instead of on every spawn.
+        """
+        version = (self.catalog_version, config_service.version)
+        if self.spawn_weights is None or self.spawn_weights[0] != version:
+            prob_list = self.configure_prob_list()
+            if any(prob < 0 for prob in prob_list):
                 raise ValueError('Probability less than zero!')
-            if prob > 1e-7:
-                return random.choices(population=self.cards_list, weights=prob_list, k=1)[0]
-        raise ValueError('All probabilities are too small!')
+            if all(prob <= 1e-7 for prob in prob_list):
+                raise ValueError('All probabilities are too small!')
+            self.spawn_weights = (version, list(itertools.accumulate(prob_list)))
+        return self.spawn_weights[1]
+
+    def apply_config(self, snapshot: ConfigSnapshot):
+        # spawn weights are rebuilt on the next spawn, the leaderboard scores only change with the rarity weights
+        if get_rarity_weights() != self.leaderboard.rarity_weights:
+            self.update_leaderboard()
+        self.cooldowns.sweep_interval = snapshot.answer_timeout
 
     def set_channels(self, channels: list[discord.TextChannel], weights: list[float]):
         self.channels = channels
         self.channel_weights = weights
 
     def add_collected_card(self, card: Card, owner_id: int):
-        if owner_id not in self.collections.keys():
-            self.collections[owner_id] = []
-        self.collections[owner_id].append(CollectedCard(card, datetime.now(), 'UNGRADED'))
-        self.save_collections()
+        collection = self.collections.get(owner_id)
+        handle = 0 if collection is None else collection.next_handle
+        self.log_event(EventType.COLLECT, user=owner_id, card=card.id, date=date_to_int(datetime.now()),
+                       grade=UNGRADED, handle=handle)
+        metrics.CARD_COLLECTS.inc(card.rarity.name.lower())
+
+    def log_event(self, event_type: EventType, **fields):
+        """
+        Logs a state change, the subscribers apply it. The collections are saved as a snapshot every
+        SNAPSHOT_INTERVAL events instead of after every change.
+        """
+        self.events.append(event_type, **fields)
+        if self.events.seq - self.snapshot_seq >= SNAPSHOT_INTERVAL:
+            self.save_collections()
+
+    def apply_collect(self, event: dict):
+        idx = self.catalog.index.get(event['card'])
+        if idx is None:
+            logger.warning('Skipping event %d, no card with the ID %s is found', event['seq'], event['card'])
+            return
+        if event['user'] not in self.collections:
+            self.collections[event['user']] = UserCollection(self.catalog)
+        self.collections[event['user']].add_row(idx, event['date'], grade_to_float(event['grade']), event['handle'])
+        self.update_collection_version(event['user'])
+
+    def count_collect(self, event: dict):
+        idx = self.catalog.index.get(event['card'])
+        if idx is None:
+            return
+        card = self.catalog.cards[idx]
+        self.ownership[card.id] = self.ownership.get(card.id, 0) + 1
+        # apply_collect already added the card to the collection
+        rows = self.collections[event['user']].cards
+        new = rows.count(idx) == 1
+        completed = new and sum(self.catalog.cards[owned].collection.id == card.collection.id
+                                for owned in set(rows)) == self.leaderboard.collection_sizes.get(card.collection.id)
+        self.leaderboard.add_card(event['user'], card, new, completed)
+        if self.pending_collects is not None:
+            self.pending_collects.append((event['user'], card, new, completed))
+
+    def apply_grade(self, event: dict):
+        collection = self.collections.get(event['user'])
+        collected_card = None if collection is None else collection.get_by_handle(event['handle'])
+        if collected_card is None:
+            logger.warning('Skipping event %d, user %d has no card with the handle %d', event['seq'], event['user'],
+                           event['handle'])
+            return
+        collected_card.grade = event['grade']
+        self.update_collection_version(event['user'])
+
+    def update_collection_version(self, user_id: int):
+        self.collection_versions[user_id] = self.collection_versions.get(user_id, 0) + 1
+
+    def update_catalog_version(self):
+        self.catalog_version += 1
+        self.update_leaderboard()
+        self.ownership = {}
+        for collection in self.collections.values():
+            for idx, count in Counter(collection.cards).items():
+                card_id = self.catalog.cards[idx].id
+                self.ownership[card_id] = self.ownership.get(card_id, 0) + count
+
+    def update_leaderboard(self):
+        """
+        Rebuilds the leaderboard after the catalog or the rarity weights change. On the event loop, the new one is
+        built in a thread from copies of the collections while the old one stays in use. Loading runs in a thread
+        without an event loop, so it builds the leaderboard right away.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self.leaderboard = Leaderboard.build(*self.get_leaderboard_input())
+            return
+        self.leaderboard_outdated = True
+        if self.leaderboard_task is None or self.leaderboard_task.done():
+            self.leaderboard_task = asyncio.create_task(self.rebuild_leaderboard())
+
+    def get_leaderboard_input(self) -> tuple:
+        return ({user_id: collection.cards[:] for user_id, collection in self.collections.items()},
+                list(self.catalog.cards), self.get_collection_sizes(), get_rarity_weights())
+
+    async def rebuild_leaderboard(self):
+        # changes made during a build start another one
+        while self.leaderboard_outdated:
+            self.leaderboard_outdated = False
+            self.pending_collects = []
+            try:
+                start = time.perf_counter()
+                leaderboard = await asyncio.to_thread(Leaderboard.build, *self.get_leaderboard_input())
+                for collect in self.pending_collects:
+                    leaderboard.add_card(*collect)
+                self.leaderboard = leaderboard
+                logger.info('Rebuilt the leaderboard in %.3f s', time.perf_counter() - start)
+            except Exception as e:
+                logger.error('Rebuilding the leaderboard failed: %r', e)
+            finally:
+                self.pending_collects = None
+
+    def get_collection_sizes(self) -> Dict[int, int]:
+        sizes = {}
+        for card in self.cards_list:
+            sizes[card.collection.id] = sizes.get(card.collection.id, 0) + 1
+        return sizes
+
+    def display_leaderboard(self, metric: Metric) -> Sequence[str]:
+        ranking = self.leaderboard.rankings[metric]
+        if len(ranking) == 0:
+            return ['Nobody has collected a card yet!']
+        return MappedSequence(ranking, lambda key: f'<@{key[1]}>: {format(-key[0], "g")}')
 
-    def open_collections(self) -> Dict[int, list[CollectedCard]]:
+    def open_collections(self) -> tuple[int, Dict[int, UserCollection]]:
+        """
+        Reads the snapshot of the collected cards.
+
+        :return: the sequence number of the last event included in the snapshot and the collections
+        """
         with open(Path('data', 'collections.json'), 'r') as file:
             d = json.load(file)
+        # collections.json from before the event log has no sequence number, it is the state before any event
+        seq, d = (d['seq'], d['collections']) if 'seq' in d else (0, d)
         dct = {}
         for key, value in d.items():
-            dct[int(key)] = []
+            collection = dct[int(key)] = UserCollection(self.catalog)
             for item in value:
-                dct[int(key)].append(CollectedCard(self.get_card_by_id(str(item['id'])),
-                                                   datetime.fromisoformat(item['date']), item['grade']))
-        return dct
+                idx = self.catalog.index.get(str(item['id']))
+                if idx is None:
+                    raise ElementNotFoundError('No card with this ID is found.')
+                collection.add_row(idx, date_to_int(datetime.fromisoformat(item['date'])),
+                                   grade_to_float(item['grade']), item.get('handle'))
+        return seq, dct
 
     def save_collections(self):
         dct = {}
         for key, value in self.collections.items():
-            dct[key] = []
-            for item in value:
-                dct[key].append({'id': item.id, 'date': item.date.isoformat(), 'grade': item.grade})
-        with open(Path('data', 'collections.json'), 'w+') as file:
-            json.dump(dct, file)
+            cards = self.catalog.cards
+            dct[key] = [{'id': cards[idx].id, 'date': int_to_date(date).isoformat(), 'grade': float_to_grade(grade),
+                         'handle': handle}
+                        for idx, date, grade, handle in zip(value.cards, value.dates, value.grades, value.handles)]
+        funcs.save_json(Path('data', 'collections.json'), {'seq': self.events.seq, 'collections': dct})
+        self.snapshot_seq = self.events.seq
+        self.events.rotate()
 
     async def display_collections(self, client: discord.Client) -> str:
         s = f'List of all of the collected cards:\n\n'
@@ -375,39 +923,42 @@ class CardGameManager:
             s += '\n'
         return s
 
-    def display_collection(self, user: discord.User, sorting: str = None) -> list[str]:
-        if user.id in self.collections:
-            count = 0
-            s = []
-
-            def key(_collected_card: CollectedCard):
-                if sorting == 'Grade':
-                    return _collected_card.grade if type(_collected_card.grade) != str else 0
-                elif sorting == 'Rarity':
-                    return _collected_card.card.rarity
-                elif sorting == 'Collection':
-                    return _collected_card.card.collection
-                else:
-                    return _collected_card.date
-
-            lst = sorted(self.collections[user.id], key=key, reverse=(sorting != 'Oldest first'))
-            for collected_card in lst:
-                card = collected_card.card
-                grade = f'{collected_card.grade.capitalize()})' if collected_card.grade == 'UNGRADED' \
-                    else f'{get_grade_emoji(collected_card.grade)} Grade: {"{:.1f}".format(collected_card.grade)})'
-                s += [f'***{card.name}*** | {get_collection_emoji(card.collection)} {card.collection.name}'
-                      f' Collection | {get_rarity_emoji(card.rarity)} {card.rarity.name.capitalize()} | {grade}']
-                count += 1
-            if count > 0:
-                return s
-        return [f'<@{user.id}>\'s collection is empty! :(']
+    def display_collection(self, user: discord.User, sorting: str = None) -> Sequence[str]:
+        """
+        Sorts the positions of the user's cards by the chosen key and formats only the cards that are displayed.
+        """
+        collection = self.collections.get(user.id)
+        if collection is None or len(collection) == 0:
+            return [f'<@{user.id}>\'s collection is empty! :(']
+        cards = self.catalog.cards
+
+        def key(idx: int):
+            if sorting == 'Grade':
+                return 0 if math.isnan(collection.grades[idx]) else collection.grades[idx]
+            elif sorting == 'Rarity':
+                return cards[collection.cards[idx]].rarity
+            elif sorting == 'Collection':
+                return cards[collection.cards[idx]].collection
+            else:
+                return collection.dates[idx]
+
+        order = sorted(range(len(collection)), key=key, reverse=(sorting != 'Oldest first'))
+        return MappedSequence(order, lambda idx: self.format_collected_card(collection[idx]))
+
+    @staticmethod
+    def format_collected_card(collected_card: CollectedCard) -> str:
+        card = collected_card.card
+        grade = f'{collected_card.grade.capitalize()})' if collected_card.grade == UNGRADED \
+            else f'{get_grade_emoji(collected_card.grade)} Grade: {"{:.1f}".format(collected_card.grade)})'
+        return f'***{card.name}*** | {get_collection_emoji(card.collection)} {card.collection.name}' \
+               f' Collection | {get_rarity_emoji(card.rarity)} {card.rarity.name.capitalize()} | {grade}'
 
     def get_card_reprs_list(self, user: discord.User, only_ungraded: bool = True) -> list[[str, int]]:
         lst = []
         if user.id in self.collections:
-            for idx, collected_card in enumerate(self.collections[user.id]):
-                if not only_ungraded or collected_card.grade == 'UNGRADED':
-                    name = [collected_card.get_str(not only_ungraded), idx]
+            for collected_card in self.collections[user.id]:
+                if not only_ungraded or collected_card.grade == UNGRADED:
+                    name = [collected_card.get_str(not only_ungraded), collected_card.handle]
                     lst.append(name)
         return lst
 
@@ -428,12 +979,15 @@ class CardGameManager:
                 'collection': card.collection.name, 'question_type': card.question.type.value,
                 'question': card.question.text, 'answer': card.question.answer_repr,
                 'chance': card.chance, 'id': card.id} for card in self.cards_list]
-        with open(Path('data', 'cards.json'), 'w+') as file:
-            json.dump(lst, file)
+        funcs.save_json(Path('data', 'cards.json'), lst)
 
     def upload_card(self, card: Card):
         self.cards_list.append(card)
+        self.catalog.add(card)
+        self.update_catalog_version()
         self.save_cards()
+        self.log_event(EventType.CARD_ADD, card=card.id, name=card.name, rarity=card.rarity.value,
+                       collection=card.collection.id)
 
     def edit_card(self, old_card: Card, new_name: str, new_rarity: int, new_question: Question, new_path: Path):
         for idx, c in enumerate(self.cards_list):
@@ -442,7 +996,9 @@ class CardGameManager:
                 self.cards_list[idx].rarity = new_rarity
                 self.cards_list[idx].question = new_question
                 self.cards_list[idx].image_path = new_path
+                self.update_catalog_version()
                 self.save_cards()
+                self.log_event(EventType.CARD_EDIT, card=c.id, name=new_name, rarity=int(new_rarity))
                 return
         raise ElementNotFoundError('Old card not found!')
 
@@ -450,18 +1006,26 @@ class CardGameManager:
         for idx, c in enumerate(self.cards_list):
             if card == c:
                 self.cards_list[idx].chance = chance
+                # only the spawn weights depend on the chances, the rest of the catalog stays valid
+                self.spawn_weights = None
                 self.save_cards()
+                self.log_event(EventType.CARD_CHANCE, card=c.id, chance=chance)
                 return
         raise ElementNotFoundError('Card not found!')
 
     def set_all_cards_chance(self, chance: float):
         for idx, c in enumerate(self.cards_list):
             self.cards_list[idx].chance = chance
+        self.spawn_weights = None
         self.save_cards()
+        self.log_event(EventType.CARD_CHANCE, card=None, chance=chance)
 
     def add_collection(self, collection: Collection):
         self.collections_list.append(collection)
+        self.update_catalog_version()
         self.save_collections_list()
+        self.log_event(EventType.COLLECTION_ADD, collection=collection.id, name=collection.name,
+                       chance=collection.chance)
 
     def edit_collection(self, old_collection: Collection, new_name: str, new_emoji: str, new_chance: float):
         for idx, c in enumerate(self.collections_list):
@@ -469,8 +1033,10 @@ class CardGameManager:
                 self.collections_list[idx].name = new_name
                 self.collections_list[idx].emoji = new_emoji
                 self.collections_list[idx].chance = new_chance
+                self.update_catalog_version()
                 self.save_collections_list()
                 self.save_cards()
+                self.log_event(EventType.COLLECTION_EDIT, collection=c.id, name=new_name, chance=new_chance)
                 return
         raise ElementNotFoundError('Old collection not found!')
 
@@ -479,20 +1045,24 @@ class CardGameManager:
             if collection == c:
                 self.collections_list.pop(idx)
                 self.cards_list = [card for card in self.cards_list if card.collection != collection]
+                self.update_catalog_version()
                 self.save_collections_list()
                 self.save_cards()
+                self.log_event(EventType.COLLECTION_DELETE, collection=c.id)
                 return
         raise ElementNotFoundError('Collection not found!')
 
     def save_grade(self, user_id: int, card: CollectedCard, grade: str | float):
         if user_id not in self.collections:
             raise UserHasNoCardsError()
+        if isinstance(card, CollectedCardView) and card.collection is self.collections[user_id]:
+            self.log_event(EventType.GRADE, user=user_id, handle=card.handle, grade=grade)
+            return
         if card not in self.collections[user_id]:
             raise ElementNotFoundError('Card not found!')
         for _card in self.collections[user_id]:
             if card == _card:
-                _card.grade = grade
-                self.save_collections()
+                self.log_event(EventType.GRADE, user=user_id, handle=_card.handle, grade=grade)
 
     def get_overall_progress(self, user_id: int) -> list[str]:
         collected_list = []
@@ -562,32 +1132,131 @@ class CardGameManager:
                     ref = idx
         return output
 
-    def add_cooldown(self, user_id: int, collect_button: CollectButton, time: datetime, length: int = ANSWER_TIMEOUT):
+    def new_spawn_id(self) -> int:
+        spawn_id = self.next_spawn_id
+        self.next_spawn_id += 1
+        return spawn_id
+
+    def add_cooldown(self, user_id: int, spawn_id: int, length: int | None = None):
         # length in seconds
-        self.cooldowns.append(Cooldown(user_id, collect_button, time, length))
+        self.cooldowns.add(user_id, spawn_id, config_service.snapshot.answer_timeout if length is None else length)
 
-    def get_remaining_cooldown(self, user_id: int, collect_button: CollectButton):
-        for cooldown in reversed(self.cooldowns):
-            if cooldown.id == user_id and cooldown.collect_button == collect_button:
-                return cooldown.length - (datetime.now() - cooldown.start).total_seconds()
-        return 0
+    def get_remaining_cooldown(self, user_id: int, spawn_id: int) -> float:
+        return self.cooldowns.get_remaining(user_id, spawn_id)
 
 
 class Cooldown:
-    def __init__(self, user_id: int, collect_button: CollectButton, start: datetime, length: int):
+    __slots__ = ('id', 'spawn_id', 'deadline')
+
+    def __init__(self, user_id: int, spawn_id: int, deadline: float):
         self.id = user_id
-        self.collect_button = collect_button
-        self.start = start
-        self.length = length
+        self.spawn_id = spawn_id
+        self.deadline = deadline
+
+    def remaining(self, now: float) -> float:
+        return self.deadline - now
+
+
+class CooldownStore:
+    """
+    Answer cooldowns keyed by (user ID, spawn ID). Deadlines use the monotonic clock, expired entries are dropped
+    when looked up and by a sweep that runs at most once per sweep interval, so the store only holds cooldowns that
+    are still running.
+    """
+    def __init__(self, sweep_interval: float):
+        self.cooldowns: Dict[tuple[int, int], Cooldown] = {}
+        self.sweep_interval = sweep_interval
+        self.next_sweep = time.monotonic() + sweep_interval
+
+    def __len__(self) -> int:
+        return len(self.cooldowns)
+
+    def add(self, user_id: int, spawn_id: int, length: float):
+        now = time.monotonic()
+        self.cooldowns[(user_id, spawn_id)] = Cooldown(user_id, spawn_id, now + length)
+        if now >= self.next_sweep:
+            self.sweep(now)
+
+    def get_remaining(self, user_id: int, spawn_id: int) -> float:
+        cooldown = self.cooldowns.get((user_id, spawn_id))
+        if cooldown is None:
+            return 0
+        remaining = cooldown.remaining(time.monotonic())
+        if remaining <= 0:
+            del self.cooldowns[(user_id, spawn_id)]
+            return 0
+        return remaining
+
+    def sweep(self, now: float | None = None):
+        now = time.monotonic() if now is None else now
+        self.cooldowns = {key: cooldown for key, cooldown in self.cooldowns.items() if cooldown.deadline > now}
+        self.next_sweep = now + self.sweep_interval
+
+
+class CardViewRegistry:
+    """
+    Keeps track of the views of the spawned cards and of the question views opened for them. All views of a spawn are
+    stopped and forgotten once the card is collected or despawns. If more than max_spawns spawns are live at once, the
+    oldest ones are handed back to the caller to be despawned.
+    """
+    def __init__(self, max_spawns: int):
+        self.max_spawns = max_spawns
+        self.spawns: Dict[int, CollectButtonView] = {}
+        self.children: Dict[int, weakref.WeakSet[discord.ui.View]] = {}
+        self.timers: Dict[int, asyncio.Task] = {}
+        self.released: weakref.WeakSet[discord.ui.View] = weakref.WeakSet()
+
+    def register_spawn(self, view: CollectButtonView) -> list[CollectButtonView]:
+        self.spawns[view.spawn_id] = view
+        self.children[view.spawn_id] = weakref.WeakSet()
+        evicted = []
+        while len(self.spawns) > self.max_spawns:
+            spawn_id = next(iter(self.spawns))
+            evicted.append(self.spawns[spawn_id])
+            self.release(spawn_id)
+        return evicted
+
+    def register_child(self, spawn_id: int, view: discord.ui.View):
+        if spawn_id in self.children:
+            self.children[spawn_id].add(view)
+
+    def set_timer(self, spawn_id: int, task: asyncio.Task):
+        self.timers[spawn_id] = task
+
+    def is_live(self, spawn_id: int) -> bool:
+        return spawn_id in self.spawns
+
+    def release(self, spawn_id: int):
+        view = self.spawns.pop(spawn_id, None)
+        children = self.children.pop(spawn_id, ())
+        timer = self.timers.pop(spawn_id, None)
+        if timer is not None and timer is not asyncio.current_task():
+            timer.cancel()
+        for _view in itertools.chain(children, () if view is None else (view,)):
+            _view.stop()
+            self.released.add(_view)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the numbers of live spawns and question views, the number of released views that are still referenced
+        somewhere (which should stay close to zero) and the memory used by the process in bytes.
+        """
+        return {'spawns': len(self.spawns),
+                'question_views': sum(len(children) for children in self.children.values()),
+                'released_alive': len(self.released),
+                'memory': funcs.get_memory_usage()}
 
 
 class CollectButtonView(discord.ui.View):
-    def __init__(self, question: Question, manager: CardGameManager, card: Card):
+    def __init__(self, question: Question, manager: CardGameManager, card: Card, spawn_id: int | None = None):
         super(CollectButtonView, self).__init__(timeout=None)
         self.message = None
         self.question = question
         self.manager = manager
         self.card = card
+        # a recovered spawn keeps its ID, the custom ID of its button has to stay the same
+        self.spawn_id = manager.new_spawn_id() if spawn_id is None else spawn_id
+        self.expires = 0.
         self.button = CollectMCQButton(self) if question.type == QuestionType.MULTIPLECHOICE else CollectSCQButton(self)
         self.add_item(self.button)
         self.timedout = False
@@ -596,9 +1265,19 @@ class CollectButtonView(discord.ui.View):
         self.message = message
 
 
+async def expire_spawn_message(message: discord.PartialMessage):
+    view = discord.ui.View()
+    view.add_item(discord.ui.Button(label='Collect!', disabled=True))
+    try:
+        await message.edit(view=view)
+    except discord.HTTPException as e:
+        logger.warning('Could not disable the button of an expired spawn: %r', e)
+    view.stop()
+
+
 class CollectButton(discord.ui.Button):
     def __init__(self, view: CollectButtonView):
-        super(CollectButton, self).__init__(label='Collect!')
+        super(CollectButton, self).__init__(label='Collect!', custom_id=f'collect:{view.spawn_id}')
         self._view = view
         self.qv = None
 
@@ -609,12 +1288,22 @@ class CollectButton(discord.ui.Button):
         self.disabled = True
         if timedout:
             await self.set_timedout()
+            metrics.CARD_DESPAWNS.inc(self._view.card.rarity.name.lower())
         message = self._view.message
-        await message.edit(view=self._view)
+        try:
+            await message.edit(view=self._view)
+        finally:
+            # a deleted message or a failed edit still ends the spawn, otherwise it would hold its slot forever
+            self._view.manager.views.release(self.spawn_id)
+            self._view.manager.save_spawns()
 
     async def set_timedout(self):
         self._view.timedout = True
 
+    @property
+    def spawn_id(self) -> int:
+        return self._view.spawn_id
+
     def timed_out(self):
         return self._view.timedout
 
@@ -627,6 +1316,7 @@ class CollectSCQButton(CollectButton):
         try:
             assert self._view.question.type == QuestionType.SINGLECHOICE
             self.qv = QuestionButtonView(self._view, interaction)
+            self._view.manager.views.register_child(self.spawn_id, self.qv)
             await interaction.response.send_message(content=f'**{self._view.question.text}**',
                                                     view=self.qv, ephemeral=True)
         except Exception as e:
@@ -680,10 +1370,11 @@ class CollectMCQButton(CollectButton):
     async def callback(self, interaction: discord.Interaction):
         try:
             assert self._view.question.type == QuestionType.MULTIPLECHOICE
-            cooldown = self._view.manager.get_remaining_cooldown(interaction.user.id, self._view.button)
+            cooldown = self._view.manager.get_remaining_cooldown(interaction.user.id, self._view.spawn_id)
             if cooldown <= 0:
                 questionnaire_view = QuestionnaireView(self._view.question, self._view.manager, self._view.card,
                                                        self._view.button, interaction)
+                self._view.manager.views.register_child(self.spawn_id, questionnaire_view)
                 await interaction.response.send_message(questionnaire_view.title,
                                                         view=questionnaire_view, ephemeral=True)
             else:
@@ -693,13 +1384,6 @@ class CollectMCQButton(CollectButton):
         except Exception as e:
             logger.error(e)
 
-    async def deactivate(self, timedout: bool):
-        self.disabled = True
-        if timedout:
-            await self.set_timedout()
-        message = self._view.message
-        await message.edit(view=self._view)
-
 
 class Questionnaire(discord.ui.Modal):
     def __init__(self, question: Question, manager: CardGameManager, card: Card, button: CollectSCQButton,
@@ -724,7 +1408,9 @@ class Questionnaire(discord.ui.Modal):
                                                 ephemeral=False)
             await self.qv.deactivate_answer_button()
         else:
-            if self.question.check_answer(str(self.answer)):
+            correct = self.question.check_answer(str(self.answer))
+            metrics.ANSWER_ATTEMPTS.inc(self.question.type.name.lower(), 'correct' if correct else 'wrong')
+            if correct:
                 await self.button.deactivate(False)
                 await self.qv.deactivate_answer_button()
                 await interaction.followup.send(
@@ -760,7 +1446,7 @@ class QuestionnaireSendButton(discord.ui.Button):
             await interaction.followup.send(f'Sorry <@{interaction.user.id}>, the card has already been collected.',
                                             ephemeral=False)
         else:
-            cooldown = self._view.manager.get_remaining_cooldown(interaction.user.id, self.qview.button)
+            cooldown = self.qview.manager.get_remaining_cooldown(interaction.user.id, self.qview.button.spawn_id)
             if cooldown > 0:
                 await interaction.followup.send(f'You have to wait for {funcs.seconds_to_string(int(cooldown + 1))}!',
                                                 ephemeral=True)
@@ -771,15 +1457,18 @@ class QuestionnaireSendButton(discord.ui.Button):
         await self.qview.collect_button_interaction.delete_original_response()
 
     async def collect(self, interaction: discord.Interaction, answer: str):
-        self.qview.manager.add_cooldown(interaction.user.id, self.qview.button, datetime.now())
-        if self.qview.question.check_answer(answer):
+        self.qview.manager.add_cooldown(interaction.user.id, self.qview.button.spawn_id)
+        correct = self.qview.question.check_answer(answer)
+        metrics.ANSWER_ATTEMPTS.inc(self.qview.question.type.name.lower(), 'correct' if correct else 'wrong')
+        if correct:
             await self.qview.button.deactivate(False)
             await interaction.followup.send(
                 f'<@{interaction.user.id}> collected ***{self.qview.card.name}***!', ephemeral=False)
             self.qview.manager.add_collected_card(self.qview.card, interaction.user.id)
         else:
             await interaction.followup.send(f'<@{interaction.user.id}> Wrong answer, try again in '
-                                            f'{funcs.seconds_to_string(ANSWER_TIMEOUT)}!', ephemeral=False)
+                                            f'{funcs.seconds_to_string(config_service.snapshot.answer_timeout)}!',
+                                            ephemeral=False)
 
 
 class AnswerSelectMenu(discord.ui.Select):
@@ -831,14 +1520,27 @@ def str_to_card(string: str, manager: CardGameManager) -> CollectedCard:
     return collected_card
 
 
-def idx_to_card(manager: CardGameManager, user_id: int, idx: int) -> CollectedCard:
-    return manager.collections[user_id][idx]
+def handle_to_card(manager: CardGameManager, user_id: int, handle: int) -> CollectedCardView | None:
+    if user_id not in manager.collections:
+        return None
+    return manager.collections[user_id].get_by_handle(handle)
 
 
 def idx_to_collection(manager: CardGameManager, idx: int) -> Collection:
     return manager.collections_list[idx]
 
 
+def get_rarity_weights() -> Dict[Rarity, float]:
+    # rarer cards are worth as many common cards as they are less likely to spawn
+    return {rarity: round(SpawnRate.COMMON / spawn_rate, 1) if spawn_rate > 0 else 0.
+            for rarity, spawn_rate in ((Rarity.COMMON, SpawnRate.COMMON), (Rarity.RARE, SpawnRate.RARE),
+                                       (Rarity.EPIC, SpawnRate.EPIC))}
+
+
+def grade_value(grade: str | float) -> float:
+    return grade if type(grade) != str else 0.
+
+
 def get_grade_emoji(grade: float) -> Emoji:
     if grade <= 6:
         emoji = Emoji.TRASH
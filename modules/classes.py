@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import itertools
 import json
 import random
@@ -12,6 +13,7 @@ import jsonpickle
 
 import modules.data as data
 import modules.functions as functions
+import modules.metrics as metrics
 import modules.ui_classes as ui_classes
 from modules.logger import logger
 
@@ -20,6 +22,8 @@ Vetoable = data.Map | data.Gamemode
 
 
 class Match3PLeague:
+    __slots__ = ('id_1', 'id_2', 'tier', 'week', 'backup', 'announced')
+
     def __init__(self, id_1: int, id_2: int, tier: data.Tier,
                  week: int, backup_1=False, backup_2=False, announced=False):
         self.id_1 = id_1
@@ -40,6 +44,9 @@ class Match3PLeague:
 
 
 class ArbitraryPick:
+    __slots__ = ('redeemed_mode', 'vetoed_modes', 'world_map_picks', 'world_map_vetoes', 'country_map_picks',
+                 'country_map_vetoes')
+
     def __init__(self, world_map_picks: list[data.Map],
                  world_map_vetoes: list[data.Map], country_map_picks: list[data.Map],
                  country_map_vetoes: list[data.Map], redeemed_mode: data.Gamemode | None,
@@ -69,6 +76,9 @@ class ArbitraryPick:
 
 
 class Pick:
+    __slots__ = ('user_id', 'match', 'redeemed_mode', 'vetoed_modes', 'world_map_picks', 'world_map_vetoes',
+                 'country_map_picks', 'country_map_vetoes', 'known_vetoes')
+
     def __init__(self, user_id: int, match: Match3PLeague, arbitrary_pick: ArbitraryPick,
                  known_vetoes: list[Vetoable] | None = None):
         self.user_id = user_id
@@ -128,6 +138,17 @@ class PickManager:
         self.country_map_list = []
         self.set_up_map_lists(self.CURRENT_WEEK)
         self.locks = []
+        self.tier_channels: typing.Dict[data.Tier, discord.TextChannel] = {}
+
+    async def fetch_tier_channels(self):
+        tiers = list(data.TIER_CHANNELS.keys())
+        channels = await asyncio.gather(*(functions.get_tier_channel(self.client, tier) for tier in tiers))
+        self.tier_channels = dict(zip(tiers, channels))
+
+    async def get_tier_channel(self, tier: data.Tier) -> discord.TextChannel:
+        if tier not in self.tier_channels:
+            self.tier_channels[tier] = await functions.get_tier_channel(self.client, tier)
+        return self.tier_channels[tier]
 
     def set_current_week(self, value: int) -> None:
         self.CURRENT_WEEK = value
@@ -172,6 +193,7 @@ class PickManager:
         logger.info('Player %s (%d) sent picks for match %s vs %s in %s in week %d. %s.', user.name, user.id,
                     match.id_1, match.id_2, match.tier.value, match.week, arbitrary_pick)
         self.save_picks()
+        metrics.PICKS.inc('pick')
         checked = functions.check_match_ready(match, self.picks)
         if checked:
             await self.set_up_match(match, send_backup_message=True)
@@ -194,6 +216,7 @@ class PickManager:
 
         self.save_picks()
         self.save_matches()
+        metrics.PICKS.inc('backup')
         checked = functions.check_match_ready(match, self.picks)
         if checked:
             await self.set_up_match(match, send_backup_message=False)
@@ -252,23 +275,22 @@ class PickManager:
                         'known_vetoes': list(map(jsonpickle.encode, pick.known_vetoes)),
                         })
 
-        with open(Path('data', 'picks.json'), 'w+') as file:
-            json.dump(lst, file)
+        functions.save_json(Path('data', 'picks.json'), lst)
 
     def open_picks(self):
         with open(Path('data', 'picks.json'), 'r') as file:
             picks = json.load(file)
         self.picks = []
         for pick in picks:
-            known_vetoes = list(map(jsonpickle.decode, pick['known_vetoes']))
+            known_vetoes = list(map(data.decode_vetoable, pick['known_vetoes']))
             vetoed_modes = [data.Gamemode(i) for i in pick['vetoed_modes']]
             match = Match3PLeague(pick['match']['id_1'], pick['match']['id_2'], data.Tier(pick['match']['tier']),
                                   pick['match']['week'], pick['match']['backup'][0], pick['match']['backup'][1],
                                   pick['match']['announced'])
-            arbitrary_pick = ArbitraryPick(list(map(jsonpickle.decode, pick['world_map_picks'])),
-                                           list(map(jsonpickle.decode, pick['world_map_vetoes'])),
-                                           list(map(jsonpickle.decode, pick['country_map_picks'])),
-                                           list(map(jsonpickle.decode, pick['country_map_vetoes'])),
+            arbitrary_pick = ArbitraryPick(list(map(data.decode_vetoable, pick['world_map_picks'])),
+                                           list(map(data.decode_vetoable, pick['world_map_vetoes'])),
+                                           list(map(data.decode_vetoable, pick['country_map_picks'])),
+                                           list(map(data.decode_vetoable, pick['country_map_vetoes'])),
                                            data.Gamemode(pick['redeemed_mode']),
                                            vetoed_modes)
             self.picks.append(Pick(pick['user_id'], match, arbitrary_pick, known_vetoes))
@@ -279,8 +301,7 @@ class PickManager:
             lst.append({'id_1': match.id_1, 'id_2': match.id_2, 'tier': match.tier, 'week': match.week,
                         'backup': match.backup, 'announced': match.announced})
 
-        with open(Path('data', 'matches.json'), 'w+') as file:
-            json.dump(lst, file)
+        functions.save_json(Path('data', 'matches.json'), lst)
         self.save_picks()
 
     def open_matches(self):
@@ -372,8 +393,9 @@ class PickManager:
         message = self.assemble_announcement_message(match, picks)
         match.announced = True
         self.save_matches()
-        channel = await functions.get_tier_channel(self.client, match.tier)
+        channel = await self.get_tier_channel(match.tier)
         await channel.send(message)
+        metrics.MATCHES_ANNOUNCED.inc()
 
     def add_match(self, match: Match3PLeague):
         for m in self.matches:
@@ -627,8 +649,7 @@ class PickManager:
         lst.append({'week': self.CURRENT_WEEK,
                     'world_maps': list(map(jsonpickle.encode, self.world_map_list)),
                     'country_maps': list(map(jsonpickle.encode, self.country_map_list))})
-        with open(Path('data', 'map_lists.json'), 'w+') as file:
-            json.dump(lst, file)
+        functions.save_json(Path('data', 'map_lists.json'), lst)
 
     def lock_pick(self, user: discord.User, match: Match3PLeague):
         self.locks.append((user.id, match))
@@ -664,16 +685,14 @@ class MessageRegistrator:
         with open(Path('data', 'config.json'), 'r') as file:
             dct = json.load(file)
         dct['message_count'] = count
-        with open(Path('data', 'config.json'), 'w') as file:
-            json.dump(dct, file)
+        functions.save_json(Path('data', 'config.json'), dct)
 
     def increase_count(self) -> None:
         with open(Path('data', 'config.json'), 'r') as file:
             dct = json.load(file)
         dct['message_count'] = (dct['message_count'] + 1) % self.threshold
         self.count = dct['message_count']
-        with open(Path('data', 'config.json'), 'w') as file:
-            json.dump(dct, file)
+        functions.save_json(Path('data', 'config.json'), dct)
 
     def check_message_count(self, threshold: int | None = None) -> bool:
         success = random.choices((True, False), (1 / threshold, 1 - 1 / threshold))[0]
@@ -697,8 +716,7 @@ class ProfileManager:
                 self.profile_dict[int(key)] = value
 
     def save_profiles(self):
-        with open(Path('data', 'profiles.json'), 'w') as file:
-            json.dump(self.profile_dict, file)
+        functions.save_json(Path('data', 'profiles.json'), self.profile_dict)
 
     def is_profile_submitted(self, user_id: int) -> bool:
         return user_id in self.profile_dict.keys()
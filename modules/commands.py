@@ -1,4 +1,5 @@
 import random
+from collections import OrderedDict
 from typing import Optional
 
 import discord
@@ -6,14 +7,18 @@ from discord import app_commands
 
 from io import BytesIO
 import modules.queue
-from modules.card_game import Rarity, Collection, Card, SCQuestion, MCQuestion, idx_to_card, idx_to_collection, \
-    QuestionType
-from modules.data import Role, ICEDOUTSERVER, OWNERS_3PLEAGUE, pop, weights, Emoji, Tier
+from modules.autocomplete import AutocompleteSource, MAX_CHOICES
+from modules.card_game import Rarity, Collection, Card, SCQuestion, MCQuestion, handle_to_card, idx_to_collection, \
+    QuestionType, UserHasNoCardsError
+from modules.data import Role, ICEDOUTSERVER, OWNERS_3PLEAGUE, pop, weights, Emoji, Tier, USER_CARD_SOURCES_SIZE
 from modules.functions import defer, is_mod, is_icy, send_permission_message, check_backup, save_image, save_week, \
-    get_nickname, contained
-from modules.initializer import manager, card_game_manager, tree, config_manager, queue_manager, profile_manager
+    get_nickname, sync_commands
+from modules.leaderboard import Metric
+from modules.initializer import manager, card_game_manager, tree, config_manager, queue_manager, profile_manager, \
+    watchdog
 from modules.logger import logger, log_errors
-from modules.pagination import paginate
+from modules.profiling import profiler, PROFILE_MODES, MAX_PROFILE_SECONDS, ProfileRunningError
+from modules.pagination import paginate, paginate_persistent, register_page_source
 from modules.ui_classes import ResetPicksUI
 
 
@@ -22,91 +27,77 @@ def get_autocomplete(names: list, values: list = None):
         values = names.copy()
     if values is not None and len(values) != len(names):
         raise ValueError('Name and value lists of different sizes')
+    source = AutocompleteSource(lambda: zip(names, values))
 
     async def autocomplete(interaction: discord.Interaction, inp: str) -> list[app_commands.Choice[str]]:
-        lst = []
-        for name, value in zip(names, values):
-            if name.lower().find(inp.lower()) == 0:
-                lst.append(app_commands.Choice(name=name, value=value))
-        for name, value in zip(names, values):
-            if name.lower().find(inp.lower()) != 0 and contained(inp.lower(), name.lower()):
-                lst.append(app_commands.Choice(name=name, value=value))
-        if len(lst) > 25:
-            lst = lst[:25:]
-        return lst
+        return source.search(inp)
     return autocomplete
 
 
+collection_source = AutocompleteSource(lambda: [(name, name) for name, idx
+                                                in card_game_manager.get_collections_reprs_list()],
+                                       lambda: card_game_manager.catalog_version)
+progress_source = AutocompleteSource(lambda: [(name, f'{idx}_12c76c7711c67894c34c234c7098642c0b7')
+                                              for name, idx in card_game_manager.get_collections_reprs_list()],
+                                     lambda: card_game_manager.catalog_version)
+cards_source = AutocompleteSource(lambda: [(str(_card), _card.id) for _card in card_game_manager.cards_list],
+                                  lambda: card_game_manager.catalog_version)
+queue_source = AutocompleteSource(lambda: [(name, name) for name in queue_manager.get_queue_reprs_list()],
+                                  lambda: queue_manager.version)
+tier_source = AutocompleteSource(lambda: [(_tier, _tier) for _tier in Tier])
+
+
 async def collection_autocomplete(interaction: discord.Interaction, inp: str) -> list[app_commands.Choice[str]]:
-    collection_list = [x[0] for x in card_game_manager.get_collections_reprs_list()]
-    lst = [app_commands.Choice(name=collection, value=collection)
-           for collection in collection_list if contained(inp.lower(), collection.lower())]
-    if len(lst) > 25:
-        lst = lst[:25:]
-    return lst
+    return collection_source.search(inp)
+
+
+user_card_sources: OrderedDict[tuple[int, bool], AutocompleteSource] = OrderedDict()
+
+
+def get_user_card_source(user_id: int, only_ungraded: bool) -> AutocompleteSource:
+    """
+    Choices of the user's cards are built once and rebuilt only after the user's collection or the catalog changes.
+    The sources of the USER_CARD_SOURCES_SIZE most recently active users are kept.
+    """
+    key = (user_id, only_ungraded)
+    if key not in user_card_sources:
+        user_card_sources[key] = AutocompleteSource(
+            lambda: [(_card_name, f'{handle}_12c76c7711c67894c34c234c7098642c0b7') for _card_name, handle
+                     in card_game_manager.get_card_reprs_list(discord.Object(id=user_id), only_ungraded)],
+            lambda: (card_game_manager.collection_versions.get(user_id, 0), card_game_manager.catalog_version))
+        while len(user_card_sources) > USER_CARD_SOURCES_SIZE:
+            user_card_sources.popitem(last=False)
+    else:
+        user_card_sources.move_to_end(key)
+    return user_card_sources[key]
 
 
 async def grade_autocomplete(interaction: discord.Interaction, card: str) -> list[app_commands.Choice[str]]:
-    cards_list = card_game_manager.get_card_reprs_list(interaction.user, only_ungraded=True)
-    lst = [app_commands.Choice(name=_card_name, value=f'{idx}_12c76c7711c67894c34c234c7098642c0b7')
-           for _card_name, idx in cards_list if contained(card.lower(), _card_name.lower())]
-    if len(lst) > 25:
-        lst = lst[:25:]
-    return lst
+    return get_user_card_source(interaction.user.id, only_ungraded=True).search(card)
 
 
 async def card_autocomplete(interaction: discord.Interaction, card: str) -> list[app_commands.Choice[str]]:
-    cards_list = card_game_manager.get_card_reprs_list(interaction.user, only_ungraded=False)
-    lst = [app_commands.Choice(name=_card_name, value=f'{idx}_12c76c7711c67894c34c234c7098642c0b7')
-           for _card_name, idx in cards_list if contained(card.lower(), _card_name.lower())]
-    if len(lst) > 25:
-        lst = lst[:25:]
-    return lst
+    return get_user_card_source(interaction.user.id, only_ungraded=False).search(card)
 
 
 async def queue_name_autocomplete(interaction: discord.Interaction, q: str) -> list[app_commands.Choice[str]]:
-    queue_list = queue_manager.get_queue_reprs_list()
-    lst = [app_commands.Choice(name=_queue_name, value=_queue_name) for _queue_name in queue_list
-           if contained(q.lower(), _queue_name.lower())]
-    if len(lst) > 25:
-        lst = lst[:25:]
-    return lst
+    return queue_source.search(q)
 
 
 async def progress_autocomplete(interaction: discord.Interaction, collection: str) -> list[app_commands.Choice[str]]:
-    collection_list = card_game_manager.get_collections_reprs_list()
-    lst = [app_commands.Choice(name='All', value=f'All')]
-    lst += [app_commands.Choice(name=_collection_name, value=f'{idx}_12c76c7711c67894c34c234c7098642c0b7')
-            for _collection_name, idx in collection_list if contained(collection.lower(), _collection_name.lower())]
-    if len(lst) > 25:
-        lst = lst[:25:]
-    return lst
+    return [app_commands.Choice(name='All', value=f'All')] + progress_source.search(collection, MAX_CHOICES - 1)
 
 
 async def cards_autocomplete(interaction: discord.Interaction, card: str) -> list[app_commands.Choice[str]]:
-    cards_list = card_game_manager.cards_list
-    lst = [app_commands.Choice(name=str(_card), value=_card.id) for _card in cards_list
-           if contained(card.lower(), str(_card).lower())]
-    if len(lst) > 25:
-        lst = lst[:25:]
-    return lst
+    return cards_source.search(card)
 
 
 async def all_cards_autocomplete(interaction: discord.Interaction, card: str) -> list[app_commands.Choice[str]]:
-    cards_list = card_game_manager.cards_list
-    lst = [app_commands.Choice(name='All', value='All')] + \
-          [app_commands.Choice(name=str(_card), value=_card.id)
-           for _card in cards_list if contained(card.lower(), str(_card).lower())]
-    if len(lst) > 25:
-        lst = lst[:25:]
-    return lst
+    return [app_commands.Choice(name='All', value='All')] + cards_source.search(card, MAX_CHOICES - 1)
 
 
 async def tier_autocomplete(interaction: discord.Interaction, tier: str) -> list[app_commands.Choice[str]]:
-    lst = [app_commands.Choice(name=_tier, value=_tier) for _tier in Tier if contained(tier.lower(), _tier.lower())]
-    if len(lst) > 25:
-        lst = lst[:25:]
-    return lst
+    return tier_source.search(tier)
 
 
 @log_errors
@@ -191,21 +182,50 @@ async def change_week(interaction: discord.Interaction, week: int):
     logger.info('%s changed the week to %d.', interaction.user.name, week)
 
 
+CARD_SORTINGS = ['Rarity', 'Grade', 'Collection', 'Newest first', 'Oldest first']
+
+
+@register_page_source('cards')
+def cards_page_source(query: str):
+    user_id, sorting = query.split(':')
+    sort_by = CARD_SORTINGS[int(sorting)] if sorting.isdigit() and int(sorting) < len(CARD_SORTINGS) else None
+    return card_game_manager.display_collection(discord.Object(id=int(user_id)), sorting=sort_by)
+
+
+@register_page_source('queue', numbered=True)
+def queue_page_source(query: str):
+    try:
+        q = queue_manager.get_queue_by_name(query)
+    except modules.queue.QueueNotFound:
+        return ['This queue no longer exists!']
+    return q.info() if not q.is_empty() else []
+
+
+@register_page_source('leaderboard', numbered=True)
+def leaderboard_page_source(query: str):
+    return card_game_manager.display_leaderboard(list(Metric)[int(query)])
+
+
+@register_page_source('profiles')
+def profiles_page_source(query: str):
+    return profile_manager.create_profiles_message_list()
+
+
 @log_errors
-@app_commands.autocomplete(sort_by=get_autocomplete(['Rarity', 'Grade', 'Collection', 'Newest first', 'Oldest first']))
+@app_commands.autocomplete(sort_by=get_autocomplete(CARD_SORTINGS))
 @tree.command(name='cards', guild=ICEDOUTSERVER)
 async def cards(interaction: discord.Interaction, user: Optional[discord.Member] = None, sort_by: Optional[str] = None):
     await interaction.response.defer()
-    lst = ['Specify the user or leave the field blank.']
     if user is None:
         # message = await card_game_manager.display_collections(client)
         user = interaction.user
+    nick = get_nickname(interaction.user)
     if isinstance(user, discord.Member):
-        lst = card_game_manager.display_collection(user, sorting=sort_by)
+        sorting = CARD_SORTINGS.index(sort_by) if sort_by in CARD_SORTINGS else ''
+        await paginate_persistent(interaction, 'cards', f'{user.id}:{sorting}', f'**{nick}\'s collection:**\n')
     else:
         logger.error('The user %s ran /cards and is not a discord Member object!', interaction.user.name)
-    nick = get_nickname(interaction.user)
-    await paginate(interaction, lst, f'**{nick}\'s collection:**\n')
+        await paginate(interaction, ['Specify the user or leave the field blank.'], f'**{nick}\'s collection:**\n')
     logger.info('%s ran /cards, permission allowed', interaction.user.name)
 
 
@@ -332,8 +352,10 @@ async def _grade(interaction: discord.Interaction, card: str):
     if '_12c76c7711c67894c34c234c7098642c0b7' not in card:
         await interaction.response.send_message(f'This is not a valid card from your collection!', ephemeral=True)
         return
-    idx = int(card.split('_')[0])
-    _card = idx_to_card(card_game_manager, interaction.user.id, idx)
+    _card = handle_to_card(card_game_manager, interaction.user.id, int(card.split('_')[0]))
+    if _card is None:
+        await interaction.response.send_message(f'This is not a valid card from your collection!', ephemeral=True)
+        return
     num = round(random.choices(population=pop, weights=weights, k=1)[0], 1)
     if num == 6.0 or num >= 9.5:
         if num == 6.0:
@@ -446,7 +468,7 @@ async def queue(interaction: discord.Interaction, action: str, queue_name: str):
             message = 'You were not in the queue!'
     elif action == 'info':
         await paginate(interaction, [], 'Queue is empty!', numbered=False) if q.is_empty()\
-             else await paginate(interaction, q.info(), 'Current queue:', numbered=True)
+             else await paginate_persistent(interaction, 'queue', q.name, 'Current queue:')
     elif action == 'push':
         if is_icy(interaction.user):
             if q.can_push():
@@ -482,8 +504,10 @@ async def show(interaction: discord.Interaction, card: str):
     if '_12c76c7711c67894c34c234c7098642c0b7' not in card:
         await interaction.response.send_message(f'This is not a valid card from your collection!', ephemeral=True)
         return
-    idx = int(card.split('_')[0])
-    _card = idx_to_card(card_game_manager, interaction.user.id, idx)
+    _card = handle_to_card(card_game_manager, interaction.user.id, int(card.split('_')[0]))
+    if _card is None:
+        await interaction.response.send_message(f'This is not a valid card from your collection!', ephemeral=True)
+        return
     total = card_game_manager.get_total(_card.card)
     player_total = card_game_manager.get_player_total(_card.card, interaction.user.id)
     ending = "ies" if player_total > 1 else "y"
@@ -518,6 +542,48 @@ async def progress(interaction: discord.Interaction, collection: Optional[str] =
     await paginate(interaction, lst, f'**{nick}\'s progress:**\n')
 
 
+@log_errors
+@app_commands.describe(user='Choose whose cards to see or leave blank to see your own:',
+                       collection='Choose a collection or leave blank to see all of the cards:')
+@app_commands.autocomplete(collection=progress_autocomplete)
+@tree.command(name='gallery', guild=ICEDOUTSERVER)
+async def gallery(interaction: discord.Interaction, user: Optional[discord.Member] = None,
+                  collection: Optional[str] = 'All'):
+    await defer(interaction, 'gallery', ephemeral=False)
+    logger.info('%s ran /gallery, permission allowed', interaction.user.name)
+    if user is None:
+        user = interaction.user
+    _collection = None
+    if collection != 'All':
+        if '_12c76c7711c67894c34c234c7098642c0b7' not in collection:
+            await interaction.followup.send(f'This is not a valid collection!', ephemeral=True)
+            return
+        _collection = idx_to_collection(card_game_manager, int(collection.split('_')[0]))
+    try:
+        image = await card_game_manager.get_gallery(user.id, _collection)
+    except UserHasNoCardsError:
+        await interaction.followup.send(f'<@{user.id}> has no cards to show here! :(')
+        return
+    with BytesIO(image) as image_binary:
+        await interaction.followup.send(file=discord.File(fp=image_binary, filename='gallery.png'))
+
+
+@log_errors
+@app_commands.describe(ranking='Choose what to rank the collectors by:')
+@app_commands.autocomplete(ranking=get_autocomplete([metric.value for metric in Metric]))
+@tree.command(name='leaderboard', guild=ICEDOUTSERVER)
+async def leaderboard(interaction: discord.Interaction, ranking: Optional[str] = Metric.TOTAL.value):
+    await defer(interaction, 'leaderboard', ephemeral=False)
+    logger.info('%s ran /leaderboard, permission allowed', interaction.user.name)
+    try:
+        metric = Metric(ranking)
+    except ValueError:
+        await interaction.followup.send('This is not a valid ranking!', ephemeral=True)
+        return
+    await paginate_persistent(interaction, 'leaderboard', str(list(Metric).index(metric)),
+                              f'**Leaderboard: {metric.value}**\n')
+
+
 @log_errors
 @app_commands.describe(link='Paste the link to your GeoGuessr profile:')
 @tree.command(name='add_profile', guild=ICEDOUTSERVER)
@@ -551,9 +617,90 @@ async def view_profiles(interaction: discord.Interaction, user: Optional[discord
     await defer(interaction, 'add_profile', ephemeral=True)
     logger.info('%s ran /view_profiles, permission allowed', interaction.user.name)
     if user is None:
-        message = profile_manager.create_profiles_message_list()
-        logger.debug(f'Created profiles message list: {message}')
-        await paginate(interaction, message, 'Profile links')
+        await paginate_persistent(interaction, 'profiles', '', 'Profile links')
     else:
         message = profile_manager.get_user_profile_message(user.id)
         await interaction.followup.send(message)
+
+
+@log_errors
+@app_commands.checks.has_any_role(Role.ICY_ROLE, Role.MOD)
+@tree.command(name='sync', guild=ICEDOUTSERVER)
+async def sync(interaction: discord.Interaction):
+    await defer(interaction, 'sync')
+    logger.info('%s ran /sync, permission allowed', interaction.user.name)
+    await sync_commands(tree, ICEDOUTSERVER, force=True)
+    await interaction.followup.send('The commands are synced!')
+
+
+@log_errors
+@app_commands.checks.has_any_role(Role.ICY_ROLE, Role.MOD)
+@tree.command(name='loop_lag', guild=ICEDOUTSERVER)
+async def loop_lag(interaction: discord.Interaction):
+    await defer(interaction, 'loop_lag')
+    logger.info('%s ran /loop_lag, permission allowed', interaction.user.name)
+    offenders = watchdog.get_offenders()
+    if len(offenders) == 0:
+        await interaction.followup.send(f'The event loop was not blocked for more than {watchdog.threshold} s '
+                                        f'recently.')
+        return
+    lines = [f'**{idx + 1}.** `{offender.location}`\n{offender.count} times, {offender.total_lag:.2f} s in total, '
+             f'at most {offender.max_lag:.2f} s' for idx, offender in enumerate(offenders)]
+    await interaction.followup.send('Calls that blocked the event loop recently:\n' + '\n'.join(lines)[:1900])
+
+
+@log_errors
+@app_commands.checks.has_any_role(Role.ICY_ROLE, Role.MOD)
+@app_commands.describe(mode='cprofile for the time spent in functions, tracemalloc for the memory allocated',
+                       seconds=f'How long to profile, at most {MAX_PROFILE_SECONDS} seconds',
+                       top='Number of entries in the summary')
+@app_commands.autocomplete(mode=get_autocomplete(list(PROFILE_MODES)))
+@tree.command(name='profile', guild=ICEDOUTSERVER)
+async def profile(interaction: discord.Interaction, mode: str, seconds: int = 30, top: int = 40):
+    await defer(interaction, 'profile')
+    logger.info('%s ran /profile, permission allowed', interaction.user.name)
+    if mode not in PROFILE_MODES:
+        await interaction.followup.send('This is not a valid profiling mode!')
+        return
+    if not 0 < seconds <= MAX_PROFILE_SECONDS or top <= 0:
+        await interaction.followup.send(f'Choose between 1 and {MAX_PROFILE_SECONDS} seconds and a positive number '
+                                        f'of entries!')
+        return
+    try:
+        if mode == 'cprofile':
+            stats, summary = await profiler.profile_cpu(seconds, top)
+            files = [discord.File(fp=BytesIO(stats), filename='profile.pstats'),
+                     discord.File(fp=BytesIO(summary.encode('utf-8')), filename='profile.txt')]
+        else:
+            summary = await profiler.profile_memory(seconds, top)
+            files = [discord.File(fp=BytesIO(summary.encode('utf-8')), filename='memory.txt')]
+    except ProfileRunningError as e:
+        await interaction.followup.send(str(e))
+        return
+    await interaction.followup.send(f'Profiled {seconds} s with {mode}:', files=files)
+
+
+@log_errors
+@app_commands.checks.has_any_role(Role.ICY_ROLE, Role.MOD)
+@tree.command(name='card_views', guild=ICEDOUTSERVER)
+async def card_views(interaction: discord.Interaction):
+    await defer(interaction, 'card_views')
+    stats = card_game_manager.views.stats()
+    await interaction.followup.send(f'Live spawns: {stats["spawns"]}\n'
+                                    f'Live question views: {stats["question_views"]}\n'
+                                    f'Released views still in memory: {stats["released_alive"]}\n'
+                                    f'Memory used: {stats["memory"] / 2 ** 20:.1f} MB')
+    logger.info('%s ran /card_views, permission allowed', interaction.user.name)
+
+
+@log_errors
+@app_commands.checks.has_any_role(Role.ICY_ROLE, Role.MOD)
+@tree.command(name='check_answers', guild=ICEDOUTSERVER)
+async def check_answers(interaction: discord.Interaction):
+    await defer(interaction, 'check_answers')
+    lst = card_game_manager.validate_answers()
+    if len(lst) == 0:
+        await interaction.followup.send('All card answers are fine!')
+    else:
+        await paginate(interaction, lst, 'Answers that can\'t be told apart:')
+    logger.info('%s ran /check_answers, permission allowed', interaction.user.name)
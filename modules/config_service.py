@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Callable, Mapping
+
+import yaml
+
+import modules.data as data
+from modules.logger import logger
+
+# Chance attribute: name in config.yml
+CHANCE_NAMES = {'ARNAV': 'arnav', 'GOAT': 'goat', 'KANAV_SKULL': 'kanav skull',
+                'IAMNOTKANAV_SKULL': 'iamnotkanav skull', 'FMBOT_FIRE': 'fmbot fire', 'FMBOT_SKULL': 'fmbot skull',
+                'INSANE_GOAT': 'insane score goat', 'INSANE_MINDBLOWN': 'insane score mindblown',
+                'PRAISE_ICY': 'praise icy', 'SKULLS_AND_BONES': 'skulls and bones', 'FISH': 'vish fish',
+                'RUINER': 'ruiner fish', 'NPC': 'npc', 'SIMON': 'simon for wc',
+                'VIDEO_STREAM_GOAT': 'video stream goat', 'KANAV_GM': 'kanav_gm', 'RANKUP': 'rankup'}
+RARITY_NAMES = {'COMMON': 'common', 'RARE': 'rare', 'EPIC': 'epic'}
+
+
+class ConfigError(ValueError):
+    def __init__(self, msg: str):
+        super(ConfigError, self).__init__(msg)
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """
+    One validated version of config.yml. Snapshots are never changed, a new version replaces the whole snapshot.
+    """
+    spawn_rate: float
+    spawns_per_hour: float
+    card_timeout: float
+    answer_timeout: int
+    answer_tolerance: int
+    card_lifetime: float
+    items_per_page: int
+    channel_ids: tuple[int, ...]
+    channel_weights: tuple[float, ...]
+    chances: Mapping[str, float]
+    rarities: Mapping[str, float]
+    reload_interval: float
+
+    @classmethod
+    def from_dict(cls, config: dict) -> ConfigSnapshot:
+        try:
+            snapshot = cls(spawn_rate=float(config['card spawn rate']),
+                           spawns_per_hour=float(config.get('card spawns per hour', 0)),
+                           card_timeout=float(config['card timeout']),
+                           answer_timeout=int(config['answer timeout']),
+                           answer_tolerance=int(config.get('answer tolerance', 0)),
+                           card_lifetime=float(config['card lifetime']),
+                           items_per_page=int(config['items per page']),
+                           channel_ids=tuple(int(key) for key in config['card spawn channels']),
+                           channel_weights=tuple(float(val) for val in config['card spawn channels'].values()),
+                           chances=MappingProxyType({name: float(config['chances'][name])
+                                                     for name in CHANCE_NAMES.values()}),
+                           rarities=MappingProxyType({name: float(config['card rarities'][name])
+                                                      for name in RARITY_NAMES.values()}),
+                           reload_interval=float(config.get('config reload interval', 10)))
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            raise ConfigError(f'Missing or malformed setting: {e!r}')
+        snapshot.validate()
+        return snapshot
+
+    def validate(self):
+        if self.spawn_rate < 1:
+            raise ConfigError('The card spawn rate has to be at least 1.')
+        if self.spawns_per_hour < 0:
+            raise ConfigError('The number of card spawns per hour can\'t be negative.')
+        if min(self.card_timeout, self.answer_timeout, self.card_lifetime, self.answer_tolerance) < 0:
+            raise ConfigError('Timeouts, the card lifetime and the answer tolerance can\'t be negative.')
+        if self.items_per_page < 1:
+            raise ConfigError('There has to be at least one item per page.')
+        if len(self.channel_ids) == 0 or min(self.channel_weights) < 0 or sum(self.channel_weights) <= 0:
+            raise ConfigError('Card spawn channel weights have to be non-negative and not all zero.')
+        if any(not 0 <= chance <= 1 for chance in self.chances.values()):
+            raise ConfigError('Chances have to be between 0 and 1.')
+        if min(self.rarities.values()) < 0 or sum(self.rarities.values()) <= 0:
+            raise ConfigError('Card rarities have to be non-negative and not all zero.')
+        if self.reload_interval <= 0:
+            raise ConfigError('The config reload interval has to be positive.')
+
+
+class ConfigService:
+    """
+    Watches config.yml and swaps in a new snapshot when the file changes and the new version is valid. An invalid
+    version is logged and ignored until the file changes again. Listeners are called with every new snapshot so that
+    the tables derived from the config can be rebuilt.
+    """
+    def __init__(self, path: Path, config: dict):
+        self.path = path
+        self.snapshot = ConfigSnapshot.from_dict(config)
+        self.version = 0
+        self.mtime = self.get_mtime()
+        self.listeners: list[Callable[[ConfigSnapshot], None]] = []
+        self.apply(self.snapshot)
+
+    def get_mtime(self) -> float | None:
+        try:
+            return os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def subscribe(self, listener: Callable[[ConfigSnapshot], None]):
+        self.listeners.append(listener)
+
+    def check(self) -> bool:
+        """
+        Reloads the config if the file was modified since the last check.
+
+        :return: whether a new snapshot was swapped in
+        """
+        mtime = self.get_mtime()
+        if mtime is None or mtime == self.mtime:
+            return False
+        self.mtime = mtime
+        return self.reload()
+
+    def reload(self) -> bool:
+        start = time.perf_counter()
+        try:
+            with open(self.path, 'r') as file:
+                snapshot = ConfigSnapshot.from_dict(yaml.load(file, data.YamlLoader))
+        except (ConfigError, yaml.YAMLError, OSError) as e:
+            logger.error('Keeping the current config, the new version of %s is invalid: %s', self.path, e)
+            return False
+        if snapshot == self.snapshot:
+            return False
+        self.snapshot = snapshot
+        self.version += 1
+        self.apply(snapshot)
+        for listener in self.listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                logger.error('Applying the new config failed: %r', e)
+        logger.info('Reloaded %s in %.3f s', self.path, time.perf_counter() - start)
+        return True
+
+    @staticmethod
+    def apply(snapshot: ConfigSnapshot):
+        # Chance and SpawnRate are read at every use, so updating them is enough to change the reactions and spawns
+        for attribute, name in CHANCE_NAMES.items():
+            setattr(data.Chance, attribute, snapshot.chances[name])
+        for attribute, name in RARITY_NAMES.items():
+            setattr(data.SpawnRate, attribute, snapshot.rarities[name])
+
+    async def watch(self):
+        while True:
+            await asyncio.sleep(self.snapshot.reload_interval)
+            self.check()
+
+
+config_service = ConfigService(Path('config.yml'), data.config)
@@ -1,31 +1,40 @@
 from __future__ import annotations
 
 import json
+import math
+import sys
 from enum import Enum
 from pathlib import Path
 
 import discord
-import numpy
+import jsonpickle
 import yaml
 
+# the LibYAML loader is several times faster than the pure Python one
+YamlLoader = getattr(yaml, 'CLoader', yaml.Loader)
 with open(Path('config.yml'), 'r') as file:
-    config = yaml.load(file, yaml.Loader)
+    config = yaml.load(file, YamlLoader)
 
-THRESHOLD = config['card spawn rate']
 MAX_THRESHOLD = config['stored messages']
-BUTTON_LIFETIME = config['card lifetime']
-TIMEOUT = config['card timeout']
-ITEMS_PER_PAGE = config['items per page']
-ANSWER_TIMEOUT = config['answer timeout']
+METRICS_PORT = config.get('metrics port', 0)
+LAG_THRESHOLD = config.get('loop lag threshold', 0.25)
+SNAPSHOT_INTERVAL = config.get('snapshot interval', 1000)
 
 pic_ext = ['.jpg', '.png', '.jpeg', '.webp']
 with open(Path('data', 'config.json'), 'r') as file:
     dct = json.load(file)
 TOKEN = dct['token']
 
-pop = numpy.arange(6, 10.1, 0.1)
+GALLERY_THUMBNAIL_SIZE = (180, 252)
+GALLERY_MAX_COLUMNS = 8
+GALLERY_MAX_CARDS = 96
+GALLERY_CACHE_SIZE = 32
+USER_CARD_SOURCES_SIZE = 256
+MAX_LIVE_SPAWNS = 10
+
+pop = [6 + i / 10 for i in range(41)]
 sigma, mean = 1, 8
-weights = (1 / (sigma * numpy.sqrt(2 * numpy.pi))) * numpy.exp(-(pop - mean) ** 2 / (2 * sigma ** 2))
+weights = [(1 / (sigma * math.sqrt(2 * math.pi))) * math.exp(-(x - mean) ** 2 / (2 * sigma ** 2)) for x in pop]
 
 WORLD_MAP_PICKS_COUNT = 1
 WORLD_MAP_VETOES_COUNT = 1
@@ -88,8 +97,10 @@ class MapTier(Enum):
 
 
 class Map:
+    __slots__ = ('name', 'link')
+
     def __init__(self, name: str, link: str):
-        self.name = name
+        self.name = sys.intern(name)
         self.link = link
 
     def __eq__(self, other: Map):
@@ -100,16 +111,31 @@ class Map:
 
 
 class WorldMap(Map):
+    __slots__ = ()
+
     def __init__(self, name: str, link: str):
         super(WorldMap, self).__init__(name, link)
 
 
 class CountryMap(Map):
+    __slots__ = ('tier',)
+
     def __init__(self, name: str, link: str, tier: MapTier):
         super(CountryMap, self).__init__(name, link)
         self.tier = tier
 
 
+def decode_vetoable(string: str) -> Map | Gamemode:
+    """
+    Decodes a map or a gamemode stored with jsonpickle. Map names are interned, since the same few names are repeated
+    in every pick and map list.
+    """
+    obj = jsonpickle.decode(string)
+    if isinstance(obj, Map):
+        obj.name = sys.intern(obj.name)
+    return obj
+
+
 WORLD_MAP_LIST = (WorldMap('A Community World', 'https://www.geoguessr.com/maps/62a44b22040f04bd36e8a914'),
                   WorldMap('A Tweaked World', 'https://www.geoguessr.com/maps/64205c50e014cf9bb1a04e01'),
                   WorldMap('A Varied World', 'https://www.geoguessr.com/maps/64ce812adc7614680516ff8c'),
@@ -517,12 +543,6 @@ TIER_CHANNELS = {Tier.S_TIER: 1211401695444209805,
 NMPZ_TIERS = ()
 MOVING_TIERS = ()
 
-CardChannelIDs = []
-CardChannelWeights = []
-for key, val in config['card spawn channels'].items():
-    CardChannelIDs.append(key)
-    CardChannelWeights.append(val)
-
 
 class SpawnRate(float):
     COMMON = config['card rarities']['common']
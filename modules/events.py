@@ -0,0 +1,127 @@
+"""
+Append-only log of the card game's state changes. Every event is one compact JSON line with a sequence number, so
+state can be restored from a snapshot and the events after it. Snapshots archive the log written before them.
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+from enum import Enum
+from pathlib import Path
+from typing import Callable, Dict, Iterator
+
+import modules.metrics as metrics
+from modules.logger import logger
+
+
+class EventType(str, Enum):
+    SPAWN = 'spawn'
+    COLLECT = 'collect'
+    GRADE = 'grade'
+    CARD_ADD = 'card_add'
+    CARD_EDIT = 'card_edit'
+    CARD_CHANCE = 'card_chance'
+    COLLECTION_ADD = 'collection_add'
+    COLLECTION_EDIT = 'collection_edit'
+    COLLECTION_DELETE = 'collection_delete'
+
+
+class EventLog:
+    """
+    The active log holds the events since the last snapshot. Subscribers are called with every new event and with
+    every event replayed at start-up, so anything they maintain is updated incrementally either way.
+    """
+    def __init__(self, path: Path, archive: Path):
+        self.path = path
+        self.archive = archive
+        self.seq = 0
+        self.first_seq: int | None = None
+        self.file = None
+        self.subscribers: Dict[EventType, list[Callable[[dict], None]]] = {}
+
+    def subscribe(self, event_type: EventType, callback: Callable[[dict], None]):
+        self.subscribers.setdefault(event_type, []).append(callback)
+
+    def append(self, event_type: EventType, **fields) -> dict:
+        self.seq += 1
+        event = {'seq': self.seq, 'time': round(time.time(), 3), 'type': event_type.value, **fields}
+        line = json.dumps(event, separators=(',', ':')) + '\n'
+        start = time.perf_counter()
+        self.open().write(line)
+        self.file.flush()
+        metrics.WRITE_BYTES.inc(self.path.name, amount=len(line))
+        metrics.WRITE_SECONDS.observe(time.perf_counter() - start, self.path.name)
+        if self.first_seq is None:
+            self.first_seq = self.seq
+        self.publish(event)
+        return event
+
+    def publish(self, event: dict):
+        for callback in self.subscribers.get(EventType(event['type']), ()):
+            callback(event)
+
+    def open(self):
+        if self.file is None:
+            # a line cut off by a crash is skipped when reading, the next event has to start on a new line
+            needs_newline = self.path.exists() and self.path.stat().st_size > 0 and not self.ends_with_newline()
+            self.file = open(self.path, 'a', encoding='utf-8')
+            if needs_newline:
+                self.file.write('\n')
+        return self.file
+
+    def ends_with_newline(self) -> bool:
+        with open(self.path, 'rb') as file:
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) == b'\n'
+
+    def read(self) -> Iterator[dict]:
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as file:
+            for number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning('Skipping the unreadable line %d of %s', number, self.path)
+                    continue
+                yield event
+
+    def replay(self, after: int) -> int:
+        """
+        Publishes the events logged after the snapshot with the given sequence number.
+
+        :return: the number of replayed events
+        """
+        self.seq = after
+        count = 0
+        for event in self.read():
+            if self.first_seq is None:
+                self.first_seq = event['seq']
+            if event['seq'] <= after:
+                # written before a crash interrupted rotating the log after the snapshot
+                continue
+            self.publish(event)
+            self.seq = event['seq']
+            count += 1
+        return count
+
+    def rotate(self):
+        """
+        Moves the active log to the archive after a snapshot that includes all of its events.
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if self.first_seq is None or not self.path.exists():
+            return
+        self.archive.mkdir(parents=True, exist_ok=True)
+        os.replace(self.path, self.archive / f'events-{self.first_seq:010d}-{self.seq:010d}.jsonl')
+        self.first_seq = None
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
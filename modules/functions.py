@@ -1,18 +1,20 @@
 from __future__ import annotations, division
 
+import hashlib
 import json
+import os
 import random
+import sys
+import time
 from functools import partial
 from os.path import isfile
 from pathlib import Path
 
 import discord
-import requests
-from PIL import Image
-from jsonpickle import decode
 
 import modules.classes as classes
 import modules.data as data
+import modules.metrics as metrics
 from modules.logger import logger
 
 
@@ -38,7 +40,8 @@ def extract_name(name: str) -> str:
 
 
 async def get_channel_by_id(client: discord.Client, channel_id: int) -> discord.TextChannel:
-    return await client.fetch_channel(channel_id)
+    # the gateway cache is kept up to date, the REST call is only needed for channels missing from it
+    return client.get_channel(channel_id) or await client.fetch_channel(channel_id)
 
 
 async def get_channel_by_link(client: discord.Client, channel_link: str) -> discord.TextChannel:
@@ -55,8 +58,7 @@ async def get_channel_by_link(client: discord.Client, channel_link: str) -> disc
 
 
 async def get_tier_channel(client: discord.Client, tier: data.Tier) -> discord.TextChannel:
-    channel_id = data.TIER_CHANNELS[tier]
-    return await client.fetch_channel(channel_id)
+    return await get_channel_by_id(client, data.TIER_CHANNELS[tier])
 
 
 async def get_message_by_id(channel: discord.TextChannel, message_id: int) -> discord.Message:
@@ -262,11 +264,13 @@ def set_up_config(settings: tuple | list, default_values: tuple = None):
     for idx, setting in enumerate(settings):
         if setting not in dct:
             dct[setting] = 0 if default_values is None else default_values[idx]
-    with open(path, 'w+') as file:
-        json.dump(dct, file)
+    save_json(path, dct)
 
 
 def save_image(image: discord.Attachment, name: str):
+    # imported here to keep them out of the bot start-up
+    import requests
+    from PIL import Image
     img = Image.open(requests.get(image.url, stream=True).raw)
     path = Path('card_images', f'{name}.png')
     count = 0
@@ -302,12 +306,60 @@ def get_map_by_name(name: str) -> data.Map:
     raise AttributeError(f"Map {name} not found!")
 
 
+def save_json(path: Path, obj):
+    """
+    Writes obj to the JSON file at path, recording the size and the duration of the write. The file is written next
+    to the old one and then replaces it, so a process killed while saving leaves the old version intact.
+    """
+    start = time.perf_counter()
+    text = json.dumps(obj)
+    temporary = path.with_name(f'{path.name}.tmp')
+    with open(temporary, 'w') as file:
+        file.write(text)
+    os.replace(temporary, path)
+    metrics.WRITE_BYTES.inc(path.name, amount=len(text))
+    metrics.WRITE_SECONDS.observe(time.perf_counter() - start, path.name)
+
+
 def save_week(week: int):
     with open(Path('data', 'config.json'), 'r') as file:
         dct = json.load(file)
     dct['week'] = week
-    with open(Path('data', 'config.json'), 'w') as file:
-        json.dump(dct, file)
+    save_json(Path('data', 'config.json'), dct)
+
+
+def get_command_tree_hash(tree: discord.app_commands.CommandTree, guild: discord.abc.Snowflake) -> str:
+    """
+    Hashes the payload that syncing the guild commands would upload: names, options, autocomplete flags and
+    permissions of every command, in a stable order.
+    """
+    payload = sorted((command.to_dict(tree) for command in tree.get_commands(guild=guild)),
+                     key=lambda x: (x['name'], x.get('type', 1)))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+async def sync_commands(tree: discord.app_commands.CommandTree, guild: discord.abc.Snowflake,
+                        force: bool = False) -> bool:
+    """
+    Syncs the guild commands with Discord unless they are unchanged since the last sync. The hash of the last synced
+    commands is stored in config.json.
+
+    :return: whether the commands were synced
+    """
+    tree_hash = get_command_tree_hash(tree, guild)
+    with open(Path('data', 'config.json'), 'r') as file:
+        dct = json.load(file)
+    if not force and dct.get('command_hash') == tree_hash:
+        logger.info('The commands are unchanged since the last sync, skipping it')
+        return False
+    start = time.perf_counter()
+    await tree.sync(guild=guild)
+    logger.info('Synced the commands in %.3f s', time.perf_counter() - start)
+    with open(Path('data', 'config.json'), 'r') as file:
+        dct = json.load(file)
+    dct['command_hash'] = tree_hash
+    save_json(Path('data', 'config.json'), dct)
+    return True
 
 
 def get_nickname(user: discord.Member) -> str:
@@ -342,7 +394,7 @@ def open_map_list(week: int, name: str) -> list[data.Map] | None:
         lst = json.load(file)
     for w in lst:
         if w['week'] == week:
-            return list(map(decode, w[name]))
+            return list(map(data.decode_vetoable, w[name]))
     return None
 
 
@@ -363,10 +415,24 @@ def contained(substring: str, source: str) -> bool:
     :param source: a source string that contains the substring
     :return: whether a substring is contained
     """
-    k = -1
-    for char in substring:
-        idx = source[k+1::].find(char)
-        if idx == -1:
-            return False
-        k = k + 1 + idx
-    return True
+    chars = iter(source)
+    return all(char in chars for char in substring)
+
+
+def get_memory_usage() -> int:
+    """
+    Returns the resident memory of the process in bytes, the peak resident memory where the current one is unknown,
+    or 0 where neither can be read (Windows).
+    """
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports it in bytes, Linux in kilobytes
+    return peak if sys.platform == 'darwin' else peak * 1024
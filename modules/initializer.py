@@ -1,17 +1,129 @@
+import asyncio
+import signal
+import time
+from functools import partial
+from typing import Awaitable, Callable
+
 import discord
 
+from modules.activity import ActivityTracker, SpawnScheduler
 from modules.card_game import CardGameManager
+from modules.config_service import config_service
 from modules.classes import PickManager, MessageRegistrator, ConfigManager, ProfileManager
-from modules.data import MAX_THRESHOLD, THRESHOLD
+import modules.metrics as metrics
+from modules.data import MAX_THRESHOLD, METRICS_PORT, LAG_THRESHOLD
+from modules.logger import logger
+from modules.pagination import PageButton
 from modules.queue import QueueManager
+from modules.watchdog import LoopWatchdog
+
+
+class LoadError(Exception):
+    def __init__(self):
+        super(LoadError, self).__init__('The bot failed to load its data.')
+
+
+class IcedOutClient(discord.Client):
+    """
+    Client that reads the bot data in a thread while it connects to the gateway instead of before logging in.
+    Everything that needs the data waits for wait_until_loaded() first. Services are background tasks started once
+    per process. Shutdown hooks run when the client is closed, including on SIGTERM, to save what a restart needs.
+    If a loader fails, the client closes without saving and the process exits with an error.
+    """
+    def __init__(self, *args, **kwargs):
+        super(IcedOutClient, self).__init__(*args, **kwargs)
+        self.loaders: list[Callable[[], None]] = []
+        self.loading: asyncio.Task | None = None
+        self.load_error: Exception | None = None
+        self.services: list[Callable[[], Awaitable]] = []
+        self.service_tasks: list[asyncio.Task] = []
+        self.shutdown_hooks: list[Callable[[], Awaitable]] = []
+        self.shutting_down = False
+        # on_ready runs again after every reconnect, but some of its work is only needed once per process
+        self.was_ready = False
+
+    async def setup_hook(self):
+        self.loading = asyncio.create_task(self.load_data())
+        self.service_tasks = [asyncio.create_task(service()) for service in self.services]
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(self.close()))
+        except NotImplementedError:
+            # Windows event loops don't support signal handlers
+            pass
+
+    async def close(self):
+        if not self.shutting_down:
+            self.shutting_down = True
+            await self.shutdown()
+        await super(IcedOutClient, self).close()
+
+    async def shutdown(self):
+        for task in self.service_tasks:
+            task.cancel()
+        # saving before the data is loaded would overwrite it with the empty state
+        if self.loading is None or not self.loading.done() or self.loading.cancelled() or self.load_error is not None:
+            logger.warning('Shutting down before the data was loaded, nothing is saved')
+            return
+        for hook in self.shutdown_hooks:
+            try:
+                await hook()
+            except Exception as e:
+                logger.error('Shutdown hook %s failed: %r', hook.__qualname__, e)
+        logger.info('Shut down cleanly')
+
+    async def load_data(self):
+        for loader in self.loaders:
+            start = time.perf_counter()
+            try:
+                await asyncio.to_thread(loader)
+            except Exception as e:
+                # the bot can't work on partly loaded data, and saving it would overwrite the files
+                logger.critical('%s failed, shutting down: %r', loader.__qualname__, e)
+                self.load_error = e
+                asyncio.create_task(self.close())
+                return
+            logger.info('%s took %.3f s', loader.__qualname__, time.perf_counter() - start)
+
+    async def wait_until_loaded(self):
+        """
+        :raise LoadError: if loading the data failed, the client is shutting down then
+        """
+        if self.loading is not None:
+            await asyncio.shield(self.loading)
+        if self.load_error is not None:
+            raise LoadError() from self.load_error
+
+
+class IcedOutTree(discord.app_commands.CommandTree):
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # commands and autocompletes arriving right after connecting wait for the data instead of failing
+        try:
+            await self.client.wait_until_loaded()
+        except LoadError as e:
+            if interaction.type == discord.InteractionType.application_command:
+                await interaction.response.send_message(str(e), ephemeral=True)
+            return False
+        return True
+
 
 intents = discord.Intents.default()
 intents.message_content = True
-client = discord.Client(intents=intents)
-tree = discord.app_commands.CommandTree(client)
+client = IcedOutClient(intents=intents)
+tree = IcedOutTree(client)
+client.add_dynamic_items(PageButton)
 manager = PickManager(client)
 registrator = MessageRegistrator(MAX_THRESHOLD)
-card_game_manager = CardGameManager(message_threshold=THRESHOLD)
+card_game_manager = CardGameManager()
 config_manager = ConfigManager()
 queue_manager = QueueManager()
 profile_manager = ProfileManager()
+watchdog = LoopWatchdog(LAG_THRESHOLD)
+activity_tracker = ActivityTracker()
+spawn_scheduler = SpawnScheduler(activity_tracker, card_game_manager)
+client.loaders.append(card_game_manager.load)
+client.shutdown_hooks.append(card_game_manager.shutdown)
+client.services += [config_service.watch, watchdog.run, spawn_scheduler.run]
+config_service.subscribe(card_game_manager.apply_config)
+if METRICS_PORT:
+    metrics.instrument_http(client)
+    client.services.append(partial(metrics.serve, '127.0.0.1', METRICS_PORT))
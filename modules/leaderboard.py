@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from collections import Counter
+from enum import Enum
+from typing import Dict, Iterable, Sequence
+
+
+class Metric(str, Enum):
+    TOTAL = 'Total cards'
+    DISTINCT = 'Distinct cards'
+    SCORE = 'Score'
+    COMPLETED = 'Completed collections'
+
+
+# every player's values are kept in a list in this order
+METRICS = list(Metric)
+METRIC_INDEX = {metric: idx for idx, metric in enumerate(METRICS)}
+
+
+class Leaderboard:
+    """
+    Collector rankings that are kept sorted as cards are collected. Every ranking is a sorted list of
+    (-value, user ID) keys, so updating a player is two binary searches instead of sorting all players. Which cards a
+    player has is not kept here, the caller tells whether a collected card is new and completes a collection.
+    """
+    def __init__(self, collection_sizes: Dict[int, int], rarity_weights: Dict[int, float]):
+        self.collection_sizes = collection_sizes
+        self.rarity_weights = rarity_weights
+        self.players: Dict[int, list[float]] = {}
+        self.rankings: Dict[Metric, list[tuple[float, int]]] = {metric: [] for metric in Metric}
+
+    @classmethod
+    def build(cls, rows: Dict[int, Iterable[int]], cards: Sequence, collection_sizes: Dict[int, int],
+              rarity_weights: Dict[int, float]) -> Leaderboard:
+        """
+        Builds the rankings from the catalog indices of every user's cards in one pass and sorts every ranking once.
+        It only reads its arguments, so it can run in a thread on copies of the collections.
+        """
+        leaderboard = cls(collection_sizes, rarity_weights)
+        scores = [rarity_weights.get(card.rarity, 0) for card in cards]
+        collection_ids = [card.collection.id for card in cards]
+        for user_id, card_indices in rows.items():
+            counts = Counter(card_indices)
+            if len(counts) == 0:
+                continue
+            collection_counts = Counter(collection_ids[idx] for idx in counts)
+            values = leaderboard.players[user_id] = [0] * len(METRICS)
+            values[METRIC_INDEX[Metric.TOTAL]] = sum(counts.values())
+            values[METRIC_INDEX[Metric.DISTINCT]] = len(counts)
+            values[METRIC_INDEX[Metric.SCORE]] = sum(scores[idx] * count for idx, count in counts.items())
+            values[METRIC_INDEX[Metric.COMPLETED]] = sum(count == collection_sizes.get(collection_id)
+                                                         for collection_id, count in collection_counts.items())
+        for metric, idx in METRIC_INDEX.items():
+            leaderboard.rankings[metric] = sorted((-values[idx], user_id)
+                                                  for user_id, values in leaderboard.players.items())
+        return leaderboard
+
+    def add_card(self, user_id: int, card, new: bool, completed: bool):
+        """
+        :param new: whether it is the player's first copy of the card
+        :param completed: whether the card is the last one the player needed to complete its collection
+        """
+        values = self.players.get(user_id)
+        if values is None:
+            values = self.players[user_id] = [0] * len(METRICS)
+            for metric in Metric:
+                insort(self.rankings[metric], (0, user_id))
+        old_values = list(values)
+        values[METRIC_INDEX[Metric.TOTAL]] += 1
+        values[METRIC_INDEX[Metric.SCORE]] += self.rarity_weights.get(card.rarity, 0)
+        if new:
+            values[METRIC_INDEX[Metric.DISTINCT]] += 1
+        if completed:
+            values[METRIC_INDEX[Metric.COMPLETED]] += 1
+        for metric, idx in METRIC_INDEX.items():
+            if values[idx] != old_values[idx]:
+                self.move(metric, user_id, old_values[idx], values[idx])
+
+    def move(self, metric: Metric, user_id: int, old_value: float, new_value: float):
+        ranking = self.rankings[metric]
+        idx = bisect_left(ranking, (-old_value, user_id))
+        if idx < len(ranking) and ranking[idx] == (-old_value, user_id):
+            ranking.pop(idx)
+        insort(ranking, (-new_value, user_id))
+
+    def get_ranking(self, metric: Metric) -> list[tuple[int, float]]:
+        return [(user_id, -value) for value, user_id in self.rankings[metric]]
+
+    def get_position(self, user_id: int, metric: Metric) -> int | None:
+        values = self.players.get(user_id)
+        if values is None:
+            return None
+        return bisect_left(self.rankings[metric], (-values[METRIC_INDEX[metric]], user_id)) + 1
@@ -0,0 +1,166 @@
+"""
+Counters and histograms exposed in the Prometheus text format by an optional local HTTP endpoint.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from bisect import bisect_left
+from typing import Dict
+
+import discord
+
+from modules.logger import logger
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1., 2.5, 5., 10.)
+
+
+def escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names: tuple[str, ...], values: tuple, extra: str = '') -> str:
+    labels = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values: Dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1.):
+        self.values[label_values] = self.values.get(label_values, 0.) + amount
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for label_values, value in self.values.items():
+            lines.append(f'{self.name}{format_labels(self.labels, label_values)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        # per label values: counts of every bucket (not cumulative), sum and count
+        self.values: Dict[tuple, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *label_values):
+        if label_values not in self.values:
+            self.values[label_values] = ([0] * (len(self.buckets) + 1), [0., 0])
+        counts, totals = self.values[label_values]
+        counts[bisect_left(self.buckets, value)] += 1
+        totals[0] += value
+        totals[1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for label_values, (counts, totals) in self.values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                labels = format_labels(self.labels, label_values, 'le="' + str(bound) + '"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            lines.append(f'{self.name}_sum{format_labels(self.labels, label_values)} {totals[0]}')
+            lines.append(f'{self.name}_count{format_labels(self.labels, label_values)} {totals[1]}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[Counter | Histogram] = []
+
+    def counter(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, documentation, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return ''.join(f'{line}\n' for metric in self.metrics for line in metric.render())
+
+
+REGISTRY = Registry()
+MESSAGES = REGISTRY.counter('icedout_messages_total', 'Messages processed.', ('channel',))
+HANDLER_HITS = REGISTRY.counter('icedout_handler_hits_total', 'Messages handled by each message handler.',
+                                ('handler',))
+CARD_SPAWNS = REGISTRY.counter('icedout_card_spawns_total', 'Cards spawned.', ('rarity',))
+CARD_COLLECTS = REGISTRY.counter('icedout_card_collects_total', 'Cards collected.', ('rarity',))
+CARD_DESPAWNS = REGISTRY.counter('icedout_card_despawns_total', 'Cards that despawned without being collected.',
+                                 ('rarity',))
+ANSWER_ATTEMPTS = REGISTRY.counter('icedout_answer_attempts_total', 'Answers given to card questions.',
+                                   ('question_type', 'result'))
+PICKS = REGISTRY.counter('icedout_picks_total', 'Picks submitted for 3P League matches.', ('kind',))
+MATCHES_ANNOUNCED = REGISTRY.counter('icedout_matches_announced_total', 'Matches announced.')
+WRITE_BYTES = REGISTRY.counter('icedout_persistence_write_bytes_total', 'Bytes written to the data files.',
+                               ('file',))
+WRITE_SECONDS = REGISTRY.histogram('icedout_persistence_write_seconds', 'Time to serialize and write a data file.',
+                                   ('file',))
+REST_REQUESTS = REGISTRY.counter('icedout_rest_requests_total', 'Discord REST calls.', ('method', 'route', 'status'))
+REST_SECONDS = REGISTRY.histogram('icedout_rest_request_seconds', 'Duration of Discord REST calls.',
+                                  ('method', 'route'))
+# observed by the heartbeat of the loop watchdog
+LOOP_LAG = REGISTRY.histogram('icedout_event_loop_lag_seconds', 'Delay of a timer on the event loop.')
+
+
+def instrument_http(client: discord.Client):
+    """
+    Wraps the REST client so that every call is counted by its route template and timed.
+    """
+    http = client.http
+    request = http.request
+
+    async def instrumented_request(route, **kwargs):
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            response = await request(route, **kwargs)
+            status = 'ok'
+            return response
+        except discord.HTTPException as e:
+            status = str(e.status)
+            raise
+        finally:
+            REST_REQUESTS.inc(route.method, route.path, status)
+            REST_SECONDS.observe(time.perf_counter() - start, route.method, route.path)
+
+    http.request = instrumented_request
+
+
+async def handle_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b'\r\n', b'\n', b''):
+            pass
+        parts = request_line.decode('latin-1').split()
+        if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+            status, body = '200 OK', REGISTRY.render().encode('utf-8')
+        else:
+            status, body = '404 Not Found', b'Not found\n'
+        writer.write(f'HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                     f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode('latin-1') + body)
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError) as e:
+        logger.debug('Metrics request failed: %r', e)
+    finally:
+        writer.close()
+
+
+async def serve(host: str, port: int):
+    server = await asyncio.start_server(handle_request, host, port)
+    logger.info('Serving metrics on http://%s:%d/metrics', host, port)
+    async with server:
+        await server.serve_forever()
@@ -1,8 +1,12 @@
-from typing import Callable, Optional
+from collections.abc import Sequence
+from typing import Callable, Dict, Iterable, Optional
 
 import discord
 
-from modules.data import ITEMS_PER_PAGE, BUTTON_LIFETIME
+from modules.config_service import config_service
+from modules.logger import logger
+
+MAX_CUSTOM_ID_LENGTH = 100
 
 
 class Pagination(discord.ui.View):
@@ -12,7 +16,7 @@ class Pagination(discord.ui.View):
         self.total_pages: Optional[int] = None
         self.index = 1
         self.message = None
-        super().__init__(timeout=BUTTON_LIFETIME)
+        super().__init__(timeout=config_service.snapshot.card_lifetime)
 
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
         if interaction.user == self.interaction.user:
@@ -73,17 +77,181 @@ def compute_total_pages(total_results: int, results_per_page: int) -> int:
     return ((total_results - 1) // results_per_page) + 1 if total_results > 0 else 1
 
 
-async def paginate(interaction: discord.Interaction, lst: list, title: str, name: str = None, numbered: bool = False):
+class MappedSequence(Sequence):
+    """
+    A read-only view of a sequence that formats its items only when they are accessed, so that a paginated menu
+    formats only the pages that are opened.
+    """
+    def __init__(self, items: Sequence, formatter: Callable):
+        self.items = items
+        self.formatter = formatter
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __getitem__(self, idx: int | slice):
+        if isinstance(idx, slice):
+            return [self.formatter(item) for item in self.items[idx]]
+        return self.formatter(self.items[idx])
+
+
+class PageSource:
+    """
+    Gives the items of a page either by slicing a sequence or, when the number of items is given, by consuming an
+    iterable only as far as the requested page.
+    """
+    def __init__(self, items: Sequence | Iterable, count: int | None = None):
+        if count is None:
+            self.items = items
+            self.iterator = None
+            self.count = len(items)
+        else:
+            self.items = []
+            self.iterator = iter(items)
+            self.count = count
+
+    def get_items(self, offset: int, limit: int) -> list:
+        if self.iterator is not None:
+            while len(self.items) < min(offset + limit, self.count):
+                try:
+                    self.items.append(next(self.iterator))
+                except StopIteration:
+                    self.count = len(self.items)
+                    break
+        return list(self.items[offset:offset + limit])
+
+
+def render_page(items: list, offset: int, page: int, total_pages: int, title: str, name: str = None,
+                numbered: bool = False) -> discord.Embed:
+    if numbered:
+        lines = [f'{idx + offset + 1}. {elem}' for idx, elem in enumerate(items)]
+    else:
+        lines = [f'{elem}' for elem in items]
+    emb = discord.Embed(title=title, description=''.join(f'{line}\n' for line in lines))
+    emb.set_author(name=name if name is not None else f"")
+    emb.set_footer(text=f"Page {page} from {total_pages}")
+    return emb
+
+
+async def paginate(interaction: discord.Interaction, lst: Sequence | Iterable, title: str, name: str = None,
+                   numbered: bool = False, count: int | None = None):
+    """
+    Sends a navigable menu with the given items. The items may be a sequence supporting len() and slicing, or any
+    iterable if their count is given. Pages are rendered when first opened and reused afterwards.
+    """
+    source = PageSource(lst, count)
+    pages: Dict[int, discord.Embed] = {}
+    items_per_page = config_service.snapshot.items_per_page
+
     async def get_page(page: int):
-        emb = discord.Embed(title=title, description="")
-        offset = (page-1) * ITEMS_PER_PAGE
-        for idx, elem in enumerate(lst[offset:offset+ITEMS_PER_PAGE]):
-            if numbered:
-                emb.description += f'{idx + offset + 1}. '
-            emb.description += f"{elem}\n"
-        emb.set_author(name=name if name is not None else f"")
-        n = compute_total_pages(len(lst), ITEMS_PER_PAGE)
-        emb.set_footer(text=f"Page {page} from {n}")
-        return emb, n
+        n = compute_total_pages(source.count, items_per_page)
+        if page not in pages:
+            offset = (page - 1) * items_per_page
+            pages[page] = render_page(source.get_items(offset, items_per_page), offset, page, n, title, name,
+                                      numbered)
+        return pages[page], n
 
     await Pagination(interaction, get_page).navigate()
+
+
+page_sources: Dict[str, tuple[Callable[[str], Sequence], bool]] = {}
+
+
+def register_page_source(kind: str, numbered: bool = False):
+    """
+    Registers a function that rebuilds the items of a persistent menu from its query string.
+    """
+    def decorator(func: Callable[[str], Sequence]):
+        page_sources[kind] = (func, numbered)
+        return func
+    return decorator
+
+
+def page_custom_id(kind: str, owner_id: int, page: int, slot: str, query: str) -> str:
+    return f'page:{kind}:{owner_id}:{page}:{slot}:{query}'
+
+
+class PageButton(discord.ui.DynamicItem[discord.ui.Button],
+                 template=r'page:(?P<kind>[a-z_]+):(?P<owner>[0-9]+):(?P<page>[0-9]+):(?P<slot>[pne]):(?P<query>.*)'):
+    """
+    Navigation button of a persistent menu. The custom ID holds the menu kind, its owner, the target page and the
+    query, so the page is rebuilt from the managers on every click and nothing is kept in memory between clicks.
+    """
+    def __init__(self, kind: str, owner_id: int, page: int, slot: str, query: str, emoji: str,
+                 disabled: bool = False):
+        super().__init__(discord.ui.Button(emoji=emoji, style=discord.ButtonStyle.blurple, disabled=disabled,
+                                           custom_id=page_custom_id(kind, owner_id, page, slot, query)))
+        self.kind = kind
+        self.owner_id = owner_id
+        self.page = page
+        self.slot = slot
+        self.query = query
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match['kind'], int(match['owner']), int(match['page']), match['slot'], match['query'],
+                   str(item.emoji), item.disabled)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # after a restart the pages can be requested before the data is read
+        await interaction.client.wait_until_loaded()
+        if interaction.user.id == self.owner_id:
+            return True
+        emb = discord.Embed(
+            description=f"Only the author of the command can perform this action.",
+            color=16711680
+        )
+        await interaction.response.send_message(embed=emb, ephemeral=True)
+        return False
+
+    async def callback(self, interaction: discord.Interaction):
+        if self.kind not in page_sources:
+            logger.error('No page source registered for the menu kind %s', self.kind)
+            await interaction.response.edit_message(view=None)
+            return
+        get_items, numbered = page_sources[self.kind]
+        old = interaction.message.embeds[0] if interaction.message.embeds else discord.Embed()
+        items = get_items(self.query)
+        items_per_page = config_service.snapshot.items_per_page
+        total_pages = compute_total_pages(len(items), items_per_page)
+        page = min(self.page, total_pages)
+        offset = (page - 1) * items_per_page
+        emb = render_page(items[offset:offset + items_per_page], offset, page, total_pages, old.title,
+                          old.author.name, numbered)
+        view = PersistentPagination(self.kind, self.owner_id, self.query, page, total_pages)
+        await interaction.response.edit_message(embed=emb, view=view if total_pages > 1 else None)
+
+
+class PersistentPagination(discord.ui.View):
+    """
+    Navigation buttons with the same layout as Pagination, made only of PageButton items. Views like this are not
+    stored by the client, so open menus take no memory and keep working after a restart.
+    """
+    def __init__(self, kind: str, owner_id: int, query: str, page: int, total_pages: int):
+        super().__init__(timeout=None)
+        last = page > total_pages // 2
+        self.add_item(PageButton(kind, owner_id, page - 1, 'p', query, "◀️", disabled=page == 1))
+        self.add_item(PageButton(kind, owner_id, page + 1, 'n', query, "▶️", disabled=page == total_pages))
+        self.add_item(PageButton(kind, owner_id, 1 if last else total_pages, 'e', query, "⏮️" if last else "⏭️"))
+
+
+async def paginate_persistent(interaction: discord.Interaction, kind: str, query: str, title: str,
+                              name: str = None):
+    """
+    Sends a menu whose pages are rebuilt by the page source registered for the kind. Falls back to an in-memory menu
+    if the query does not fit in a custom ID.
+    """
+    get_items, numbered = page_sources[kind]
+    items = get_items(query)
+    items_per_page = config_service.snapshot.items_per_page
+    total_pages = compute_total_pages(len(items), items_per_page)
+    if len(page_custom_id(kind, interaction.user.id, total_pages + 1, 'e', query)) > MAX_CUSTOM_ID_LENGTH:
+        logger.warning('The query %s is too long for a persistent %s menu', query, kind)
+        await paginate(interaction, items, title, name, numbered)
+        return
+    emb = render_page(items[:items_per_page], 0, 1, total_pages, title, name, numbered)
+    if total_pages == 1:
+        await interaction.followup.send(embed=emb)
+    else:
+        await interaction.followup.send(embed=emb, view=PersistentPagination(kind, interaction.user.id, query, 1,
+                                                                             total_pages))
@@ -0,0 +1,87 @@
+"""
+Profiling of the running bot on request. Nothing is hooked in while no profile runs, so it costs nothing otherwise.
+"""
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import contextlib
+import io
+import marshal
+import pstats
+import tracemalloc
+
+PROFILE_MODES = ('cprofile', 'tracemalloc')
+MAX_PROFILE_SECONDS = 300
+TRACEMALLOC_FRAMES = 10
+
+
+class ProfileRunningError(RuntimeError):
+    def __init__(self):
+        super(ProfileRunningError, self).__init__('A profile is already running!')
+
+
+class Profiler:
+    def __init__(self):
+        self.running = False
+
+    async def profile_cpu(self, seconds: float, top: int = 40) -> tuple[bytes, str]:
+        """
+        Profiles the event loop thread with cProfile for the given time.
+
+        :return: the stats in the pstats file format and a summary of the functions with the highest own and cumulative
+            time
+        """
+        profiler = cProfile.Profile()
+        with self.run():
+            profiler.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profiler.disable()
+        summary = io.StringIO()
+        stats = pstats.Stats(profiler, stream=summary)
+        # the loop itself has the highest cumulative time, the own time shows the expensive functions first
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(top)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+        # the same content as pstats.Stats.dump_stats() writes to a file
+        return marshal.dumps(stats.stats), summary.getvalue()
+
+    async def profile_memory(self, seconds: float, top: int = 40) -> str:
+        """
+        Compares tracemalloc snapshots from the start and the end of the given time.
+
+        :return: the lines with the largest growth of allocated memory
+        """
+        with self.run():
+            started = not tracemalloc.is_tracing()
+            if started:
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+            try:
+                before = tracemalloc.take_snapshot()
+                await asyncio.sleep(seconds)
+                after = tracemalloc.take_snapshot()
+                traced, peak = tracemalloc.get_traced_memory()
+            finally:
+                if started:
+                    tracemalloc.stop()
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__),
+                   tracemalloc.Filter(False, '<frozen importlib._bootstrap>')]
+        diff = after.filter_traces(filters).compare_to(before.filter_traces(filters), 'lineno')
+        lines = [f'Traced memory: {traced / 2 ** 20:.1f} MB, peak {peak / 2 ** 20:.1f} MB',
+                 f'Change over {seconds} s: {sum(stat.size_diff for stat in diff) / 2 ** 10:+.1f} KB', '']
+        lines += [str(stat) for stat in diff[:top]]
+        return '\n'.join(lines)
+
+    @contextlib.contextmanager
+    def run(self):
+        if self.running:
+            raise ProfileRunningError()
+        self.running = True
+        try:
+            yield
+        finally:
+            self.running = False
+
+
+profiler = Profiler()
@@ -6,6 +6,7 @@ from pathlib import Path
 
 import discord
 
+import modules.functions as functions
 from modules.data import Role
 
 
@@ -17,6 +18,7 @@ class QueueNotFound(Exception):
 class QueueManager:
     def __init__(self):
         self.queues: list[Queue] = []
+        self.version = 0
 
     def get_queue_reprs_list(self) -> list[str]:
         return [str(queue) for queue in self.queues]
@@ -25,11 +27,11 @@ class QueueManager:
         with open(Path('data', 'queue.json'), 'r') as file:
             lst = json.load(file)
         self.queues = jsonpickle.decode(lst)
+        self.version += 1
 
     def save_queues(self):
         lst = jsonpickle.encode(self.queues)
-        with open(Path('data', 'queue.json'), 'w+') as file:
-            json.dump(lst, file)
+        functions.save_json(Path('data', 'queue.json'), lst)
 
     def get_queue_by_name(self, name: str) -> Queue:
         for queue in self.queues:
@@ -39,10 +41,13 @@ class QueueManager:
 
     def add_queue(self, queue: Queue):
         self.queues.append(queue)
+        self.version += 1
         self.save_queues()
 
 
 class Queue:
+    __slots__ = ('name', 'pos', 'ids', 'roles')
+
     def __init__(self, name: str, roles: tuple[Role] = None):
         self.name = name
         self.pos = 0
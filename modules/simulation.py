@@ -0,0 +1,188 @@
+"""
+Monte Carlo simulation of the card game economy.
+
+Reads the live cards.json, collections_list.json and config.yml and simulates spawns and collections in vectorized
+batches of runs. Run from the bot directory, for example:
+
+    python -m modules.simulation --weeks 26 --messages-per-hour 300 --players 40
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy
+import yaml
+
+RARITIES = {15: 'common', 25: 'rare', 35: 'epic'}
+RARITY_NAMES = {'COMMON': 15, 'RARE': 25, 'EPIC': 35}
+SECONDS_PER_WEEK = 7 * 24 * 3600
+
+
+class Catalog:
+    def __init__(self, names: list[str], rarities: numpy.ndarray, collections: numpy.ndarray,
+                 collection_names: list[str], weights: numpy.ndarray):
+        self.names = names
+        self.rarities = rarities
+        self.collections = collections
+        self.collection_names = collection_names
+        self.weights = weights
+
+
+def load_catalog(data_path: Path, config: dict) -> Catalog:
+    with open(data_path / 'collections_list.json', 'r') as file:
+        collections_list = json.load(file)
+    with open(data_path / 'cards.json', 'r') as file:
+        cards = json.load(file)
+    collection_idx = {collection['name'].lower(): idx for idx, collection in enumerate(collections_list)}
+    spawn_rates = {15: config['card rarities']['common'], 25: config['card rarities']['rare'],
+                   35: config['card rarities']['epic']}
+    names, rarities, collections, weights = [], [], [], []
+    for card in cards:
+        rarity = card['rarity'] if type(card['rarity']) == int else RARITY_NAMES[card['rarity']]
+        idx = collection_idx[card['collection'].lower()]
+        names.append(card['name'])
+        rarities.append(rarity)
+        collections.append(idx)
+        weights.append(spawn_rates.get(rarity, 0) * card.get('chance', 1.) * collections_list[idx]['chance'])
+    return Catalog(names, numpy.array(rarities, dtype=numpy.int32), numpy.array(collections, dtype=numpy.int32),
+                   [collection['name'] for collection in collections_list], numpy.array(weights, dtype=float))
+
+
+def player_shares(players: int, skew: float) -> numpy.ndarray:
+    # Zipf-like activity: the player of rank k collects proportionally to 1 / k ** skew
+    shares = 1 / numpy.arange(1, players + 1) ** skew
+    return shares / shares.sum()
+
+
+def simulate(catalog: Catalog, config: dict, weeks: float, messages_per_hour: float, players: int,
+             collect_rate: float, skew: float, runs: int, batch_size: int = 32, seed: int | None = None) -> dict:
+    """
+    Spawns follow the bot's rules. With card spawns per hour set, the time between spawns is the card timeout plus an
+    exponential wait that makes the configured average, whatever the traffic. Chat is assumed to be active all the
+    time and equally in every spawn channel, so spawns never wait for activity and channels are chosen by their
+    weights. With card spawns per hour set to 0, every message spawns a card with probability 1 / card spawn rate,
+    but only once the card timeout has passed since the previous spawn, so the wait is for the next successful
+    message instead. Each spawn is collected with the given probability by a player drawn by activity share.
+    """
+    rng = numpy.random.default_rng(seed)
+    horizon = weeks * SECONDS_PER_WEEK
+    threshold = config['card spawn rate']
+    timeout = config['card timeout']
+    channel_weights = numpy.array(list(config['card spawn channels'].values()), dtype=float)
+    channel_ids = list(config['card spawn channels'].keys())
+    total_weight = catalog.weights.sum()
+    if len(catalog.names) == 0 or total_weight <= 0:
+        raise ValueError('There are no spawnable cards!')
+    card_p = catalog.weights / total_weight
+    shares = player_shares(players, skew)
+    tracked = {'most active player': 0, 'median player': players // 2}
+    spawns_per_hour = config.get('card spawns per hour', 0)
+    if spawns_per_hour > 0:
+        timeout = min(timeout, 3600 / spawns_per_hour)
+        wait = 3600 / spawns_per_hour - timeout
+    else:
+        wait = threshold * 3600 / messages_per_hour
+    mean_gap = timeout + wait
+    spawns_per_run = int(horizon / mean_gap * 1.1 + 10 * numpy.sqrt(horizon / mean_gap) + 10)
+
+    rarity_values = sorted(RARITIES)
+    spawned_by_rarity = numpy.zeros(len(rarity_values))
+    collected_by_rarity = numpy.zeros(len(rarity_values))
+    channel_load = numpy.zeros(len(channel_ids))
+    completion = {name: numpy.full((runs, len(catalog.collection_names)), numpy.inf) for name in tracked}
+    rarity_idx = numpy.searchsorted(rarity_values, catalog.rarities)
+    # collections without cards are never completed
+    empty = numpy.bincount(catalog.collections, minlength=len(catalog.collection_names)) == 0
+
+    for start in range(0, runs, batch_size):
+        size = min(batch_size, runs - start)
+        gaps = timeout + rng.exponential(wait, size=(size, spawns_per_run))
+        times = numpy.cumsum(gaps, axis=1)
+        valid = times <= horizon
+        cards = rng.choice(len(card_p), size=(size, spawns_per_run), p=card_p)
+        channels = rng.choice(len(channel_ids), size=(size, spawns_per_run), p=channel_weights / channel_weights.sum())
+        collected = valid & (rng.random((size, spawns_per_run)) < collect_rate)
+        collectors = rng.choice(players, size=(size, spawns_per_run), p=shares)
+
+        spawned_by_rarity += numpy.bincount(rarity_idx[cards[valid]], minlength=len(rarity_values))
+        collected_by_rarity += numpy.bincount(rarity_idx[cards[collected]], minlength=len(rarity_values))
+        channel_load += numpy.bincount(channels[valid], minlength=len(channel_ids))
+
+        for name, player in tracked.items():
+            mask = collected & (collectors == player)
+            for run in range(size):
+                idx = numpy.flatnonzero(mask[run])
+                first_card, first = numpy.unique(cards[run, idx], return_index=True)
+                first_time = numpy.full(len(card_p), numpy.inf)
+                first_time[first_card] = times[run, idx[first]]
+                last_needed = numpy.full(len(catalog.collection_names), -numpy.inf)
+                numpy.maximum.at(last_needed, catalog.collections, first_time)
+                last_needed[empty] = numpy.inf
+                completion[name][start + run] = last_needed
+
+    result = {'weeks': weeks, 'runs': runs,
+              'spawns per week': {RARITIES[r]: spawned_by_rarity[i] / runs / weeks
+                                  for i, r in enumerate(rarity_values)},
+              'collected per week': {RARITIES[r]: collected_by_rarity[i] / runs / weeks
+                                     for i, r in enumerate(rarity_values)},
+              'channel spawns per week': {str(channel): channel_load[i] / runs / weeks
+                                          for i, channel in enumerate(channel_ids)},
+              'collection completion': {}}
+    for name in tracked:
+        result['collection completion'][name] = {}
+        for idx, collection in enumerate(catalog.collection_names):
+            weeks_needed = completion[name][:, idx] / SECONDS_PER_WEEK
+            done = numpy.isfinite(weeks_needed)
+            # with interpolation, a quantile at exactly the completed share would reach into the unfinished runs
+            result['collection completion'][name][collection] = {
+                'completed share': float(done.mean()),
+                'median weeks': float(numpy.quantile(weeks_needed, 0.5, method='inverted_cdf'))
+                if done.mean() >= 0.5 else None,
+                'p90 weeks': float(numpy.quantile(weeks_needed, 0.9, method='inverted_cdf'))
+                if done.mean() >= 0.9 else None,
+            }
+    return result
+
+
+def format_report(result: dict) -> str:
+    lines = [f'Simulated {result["runs"]} runs of {result["weeks"]} weeks.', '', 'Spawned / collected per week:']
+    for rarity, value in result['spawns per week'].items():
+        lines.append(f'  {rarity}: {value:.1f} / {result["collected per week"][rarity]:.1f}')
+    lines += ['', 'Spawns per week by channel:']
+    for channel, value in result['channel spawns per week'].items():
+        lines.append(f'  {channel}: {value:.1f}')
+    for name, collections in result['collection completion'].items():
+        lines += ['', f'Weeks to complete each collection for the {name}:']
+        for collection, stats in collections.items():
+            median = 'never' if stats['median weeks'] is None else f'{stats["median weeks"]:.1f}'
+            p90 = 'never' if stats['p90 weeks'] is None else f'{stats["p90 weeks"]:.1f}'
+            lines.append(f'  {collection}: median {median}, p90 {p90}, '
+                         f'completed in {stats["completed share"] * 100:.0f}% of runs')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate card spawns and collections.')
+    parser.add_argument('--config', type=Path, default=Path('config.yml'))
+    parser.add_argument('--data', type=Path, default=Path('data'))
+    parser.add_argument('--weeks', type=float, default=26)
+    parser.add_argument('--messages-per-hour', type=float, default=300,
+                        help='used only if card spawns per hour is 0 in the config')
+    parser.add_argument('--players', type=int, default=40)
+    parser.add_argument('--collect-rate', type=float, default=0.9, help='share of spawns that get collected')
+    parser.add_argument('--skew', type=float, default=1., help='Zipf exponent of player activity')
+    parser.add_argument('--runs', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--json', action='store_true', help='print the raw results as JSON')
+    args = parser.parse_args()
+    with open(args.config, 'r') as file:
+        config = yaml.safe_load(file)
+    result = simulate(load_catalog(args.data, config), config, args.weeks, args.messages_per_hour, args.players,
+                      args.collect_rate, args.skew, args.runs, seed=args.seed)
+    print(json.dumps(result, indent=2) if args.json else format_report(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Finds code that blocks the event loop. A heartbeat task ticks on the loop and a helper thread watches it: when the
+heartbeat is late by more than the threshold, the thread captures the stack of the loop thread, which is still
+inside the blocking call, and logs the frame it is stuck in. The heartbeat also records the loop lag metric.
+"""
+from __future__ import annotations
+
+import asyncio
+import sys
+import sysconfig
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+
+import modules.metrics as metrics
+from modules.logger import logger
+
+ROOT = Path(__file__).resolve().parent.parent
+# the standard library and installed packages, a virtual environment can be inside ROOT
+LIBRARY_PATHS = tuple({Path(path).resolve() for name, path in sysconfig.get_paths().items()
+                       if name in ('stdlib', 'platstdlib', 'purelib', 'platlib')})
+
+
+@dataclass
+class Stall:
+    location: str
+    stack: str
+    lag: float
+    timestamp: float
+
+
+@dataclass
+class Offender:
+    location: str
+    count: int
+    total_lag: float
+    max_lag: float
+
+
+class LoopWatchdog:
+    def __init__(self, threshold: float, interval: float = 0.1, history: int = 200):
+        self.threshold = threshold
+        self.interval = interval
+        self.stalls: deque[Stall] = deque(maxlen=history)
+        self.heartbeat = time.monotonic()
+        self.loop_thread_id: int | None = None
+        # stack captured by the helper thread for the stall in progress, it is completed by the heartbeat
+        self.pending: tuple[str, str] | None = None
+        self.lock = threading.Lock()
+
+    async def run(self):
+        self.loop_thread_id = threading.get_ident()
+        self.heartbeat = time.monotonic()
+        threading.Thread(target=self.watch, name='loop-watchdog', daemon=True).start()
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = now - self.heartbeat - self.interval
+            metrics.LOOP_LAG.observe(max(0., lag))
+            with self.lock:
+                self.heartbeat = now
+                pending, self.pending = self.pending, None
+            if lag >= self.threshold:
+                location, stack = pending if pending is not None else ('unknown', '')
+                self.stalls.append(Stall(location, stack, lag, time.time()))
+                logger.warning('The event loop was blocked for %.3f s in %s', lag, location)
+
+    def watch(self):
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                if self.pending is not None or time.monotonic() - self.heartbeat - self.interval < self.threshold:
+                    continue
+                frame = sys._current_frames().get(self.loop_thread_id)
+                if frame is None:
+                    continue
+                stack = traceback.extract_stack(frame)
+                del frame
+                location, text = get_location(stack), ''.join(stack.format())
+                self.pending = (location, text)
+            logger.warning('The event loop is blocked in %s\n%s', location, text)
+
+    def get_offenders(self, limit: int = 10) -> list[Offender]:
+        """
+        Locations of the recent stalls, the ones that blocked the loop for the longest in total first.
+        """
+        offenders = {}
+        for stall in list(self.stalls):
+            offender = offenders.setdefault(stall.location, Offender(stall.location, 0, 0., 0.))
+            offender.count += 1
+            offender.total_lag += stall.lag
+            offender.max_lag = max(offender.max_lag, stall.lag)
+        return sorted(offenders.values(), key=lambda x: x.total_lag, reverse=True)[:limit]
+
+
+def get_location(stack: traceback.StackSummary) -> str:
+    """
+    The innermost frame of the bot's own code, it is the call that blocks. Frames of libraries are used only if the
+    stack has no frame of the bot.
+    """
+    for frame in reversed(stack):
+        if is_own_code(frame.filename):
+            path = Path(frame.filename).resolve()
+            return f'{path.relative_to(ROOT)}:{frame.lineno} in {frame.name} ({frame.line})'
+    frame = stack[-1]
+    return f'{frame.filename}:{frame.lineno} in {frame.name} ({frame.line})'
+
+
+def is_own_code(filename: str) -> bool:
+    # frozen and generated code has names like <frozen runpy>, which would resolve into the working directory
+    if filename.startswith('<'):
+        return False
+    path = Path(filename).resolve()
+    if not path.is_relative_to(ROOT) or path.name == 'watchdog.py':
+        return False
+    if 'site-packages' in path.parts or 'dist-packages' in path.parts:
+        return False
+    return not any(path.is_relative_to(library) for library in LIBRARY_PATHS)
@@ -1,16 +1,21 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import sys
+import time
 from pathlib import Path
 
 import discord
 
 # noinspection PyUnresolvedReferences
 import modules.commands
-from modules.data import THRESHOLD, TOKEN, SERVER, CardChannelIDs, CardChannelWeights, ICEDOUTSERVER_ID
-from modules.functions import get_channel_by_id, set_up_config, talk
+import modules.metrics as metrics
+from modules.config_service import config_service, ConfigSnapshot
+from modules.data import TOKEN, SERVER, ICEDOUTSERVER_ID
+from modules.functions import get_channel_by_id, set_up_config, sync_commands, talk
 from modules.initializer import client, manager, registrator, card_game_manager, tree, config_manager, queue_manager, \
-    profile_manager
+    profile_manager, activity_tracker, spawn_scheduler
 from modules.logger import logger
 from modules.on_message_functions import func_list
 
@@ -21,40 +26,84 @@ with open(Path('data', 'config.json'), 'r') as config:
     config_manager.PLAYOFFS = _dct['playoffs']
 
 
+def load_pick_state():
+    manager.set_current_week(config_manager.CURRENT_WEEK)
+    manager.open_picks()
+    manager.open_matches()
+
+
+# the state on disk is read once per process while the client connects, reconnects keep the state in memory
+client.loaders += [load_pick_state, queue_manager.open_queues, profile_manager.open_profiles]
+
+
 @client.event
 async def on_message(message: discord.Message):
     if message.author == client.user:
         return
+    await client.wait_until_loaded()
     try:
         logger.info('Message by %s in %s: \"%s\"', message.author.name, message.channel.name, message.content)
     except AttributeError:
         logger.info('Message by %s in DMs: \"%s\"', message.author.name, message.content)
         return
+    metrics.MESSAGES.inc(message.channel.name)
     if await talk(message, client):
+        metrics.HANDLER_HITS.inc('talk')
         return
     for func in func_list:
         try:
             if await func(message):
+                metrics.HANDLER_HITS.inc(func.__name__)
                 break
         except Exception as e:
             logger.error(e)
     if message.guild.id == ICEDOUTSERVER_ID:
+        activity_tracker.record(message.channel.id)
         registrator.increase_count()
-        if registrator.check_message_count(THRESHOLD):
-            await card_game_manager.play()
+        if not spawn_scheduler.enabled and registrator.check_message_count(config_service.snapshot.spawn_rate):
+            await card_game_manager.play(spawn_scheduler.choose_channel())
+
+
+async def refresh_channels():
+    """
+    Gets the card spawn channels and the tier channels concurrently, from the gateway cache when possible.
+    """
+    snapshot = config_service.snapshot
+    spawn_channels, _ = await asyncio.gather(
+        asyncio.gather(*(get_channel_by_id(client, chid) for chid in snapshot.channel_ids)),
+        manager.fetch_tier_channels())
+    card_game_manager.set_channels(list(spawn_channels), list(snapshot.channel_weights))
+
+
+def update_spawn_channels(snapshot: ConfigSnapshot):
+    if card_game_manager.channels is None:
+        return
+    if [channel.id for channel in card_game_manager.channels] == list(snapshot.channel_ids):
+        card_game_manager.set_channels(card_game_manager.channels, list(snapshot.channel_weights))
+    else:
+        asyncio.create_task(refresh_channels())
+
+
+config_service.subscribe(update_spawn_channels)
 
 
 @client.event
 async def on_ready():
-    manager.set_current_week(config_manager.CURRENT_WEEK)
-    manager.open_picks()
-    manager.open_matches()
-    queue_manager.open_queues()
-    profile_manager.open_profiles()
-    card_game_manager.set_channels([await get_channel_by_id(client, chid) for chid in CardChannelIDs],
-                                   CardChannelWeights)
-    await tree.sync(guild=SERVER)
-    logger.info('Bot is ready.')
+    # runs again after every reconnect, which only refreshes the Discord objects
+    start = time.perf_counter()
+    await client.wait_until_loaded()
+    logger.info('Waiting for the data took %.3f s', time.perf_counter() - start)
+    step = time.perf_counter()
+    await refresh_channels()
+    logger.info('Refreshing the channels took %.3f s', time.perf_counter() - step)
+    if not client.was_ready:
+        # the spawns of the last process and the command tree don't change while the process runs
+        client.was_ready = True
+        await card_game_manager.recover_spawns(client)
+        await sync_commands(tree, SERVER)
+    logger.info('Bot is ready in %.3f s.', time.perf_counter() - start)
 
 if __name__ == '__main__':
     client.run(TOKEN)
+    if client.load_error is not None:
+        sys.exit(1)
@@ -0,0 +1,10 @@
+import os
+import sys
+from pathlib import Path
+
+# the bot reads config.yml and data/ relative to the working directory, like start.py is run from the bot directory
+ROOT = Path(__file__).resolve().parent.parent
+os.chdir(ROOT)
+sys.path.insert(0, str(ROOT))
+# the logger writes to logs/, which a bot installation already has
+(ROOT / 'logs').mkdir(exist_ok=True)
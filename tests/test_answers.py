@@ -0,0 +1,33 @@
+from modules.card_game import MCQuestion, SCQuestion
+
+
+def test_multiple_choice_compares_options_exactly():
+    question = MCQuestion('Which language?', 'C++;C;C#')
+    assert question.check_answer('C++')
+    assert not question.check_answer('C')
+    assert not question.check_answer('C#')
+
+
+def test_multiple_choice_options_made_of_symbols():
+    question = MCQuestion('Which one?', '🐟;🐐;!!')
+    assert question.check_answer('🐟')
+    assert not question.check_answer('🐐')
+    assert not question.check_answer('!!')
+    question = MCQuestion('Which number?', '-5;5')
+    assert question.check_answer('-5')
+    assert not question.check_answer('5')
+
+
+def test_single_choice_answers_made_of_symbols():
+    question = SCQuestion('Which one?', '🐟;?')
+    assert question.normalized_answers == frozenset({'🐟', '?'})
+    assert question.check_answer('🐟', tolerance=0)
+    assert question.check_answer(' ? ', tolerance=0)
+    assert not question.check_answer('🐐', tolerance=0)
+
+
+def test_single_choice_answers_are_normalized():
+    question = SCQuestion('Where?', 'Côte d\'Ivoire;Ivory Coast')
+    assert question.check_answer('cote divoire', tolerance=0)
+    assert question.check_answer('IVORY  coast!', tolerance=0)
+    assert not question.check_answer('Ivory', tolerance=0)